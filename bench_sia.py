@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""Benchmarks of the PNSC check on scalable families of synthetic networks"""
+
+import igraph, sia
+import argparse, json, multiprocessing, resource, sys, time
+
+def createBox( name, edges, labels ):
+    """create the graph of a box from its edges and the action labels, e.g.
+    "a!" """
+    g = igraph.Graph( max( [0] + [ max( e ) + 1 for e in edges ] ), edges,
+            True )
+    g['name'] = name
+    g.es['name'] = [ label[:-1] for label in labels ]
+    g.es['mode'] = [ label[-1] for label in labels ]
+    return g
+
+def createRing( n ):
+    """a ring of `n` crossroad boxes, each box takes a car from outside and
+    passes it to the next box or takes a car from the previous box and lets
+    it leave"""
+    nw = igraph.Graph( n, [ ( i, ( i + 1 ) % n ) for i in range( n ) ], True )
+    nw.es['sia'] = [ "c" + str( i ) for i in range( n ) ]
+    nw.vs['sia'] = [ "X" + str( i ) for i in range( n ) ]
+    gs = []
+    for i in range( n ):
+        gs.append( createBox( "X" + str( i ), [(0,1),(1,0),(0,2),(2,0)],
+            [ "i" + str( i ) + "?", "c" + str( i ) + "!",
+                "c" + str( ( i - 1 ) % n ) + "?", "o" + str( i ) + "!" ] ) )
+    return nw, gs
+
+def createPipeline( n ):
+    """a pipeline of `n` stages, each stage receives from the previous stage
+    and sends to the next one"""
+    nw = igraph.Graph( n, [ ( i, i + 1 ) for i in range( n - 1 ) ], True )
+    nw.es['sia'] = [ "c" + str( i ) for i in range( n - 1 ) ]
+    nw.vs['sia'] = [ "P" + str( i ) for i in range( n ) ]
+    gs = [ createBox( "P0", [(0,0)], ["c0!"] ) ]
+    for i in range( 1, n - 1 ):
+        gs.append( createBox( "P" + str( i ), [(0,1),(1,0)],
+            [ "c" + str( i - 1 ) + "?", "c" + str( i ) + "!" ] ) )
+    gs.append( createBox( "P" + str( n - 1 ), [(0,1),(1,0)],
+        [ "c" + str( n - 2 ) + "?", "o!" ] ) )
+    return nw, gs
+
+def createForkJoin( n ):
+    """a source feeding a fork box which distributes the messages to `n`
+    workers whose results are collected by a join box"""
+    names = ["A", "CP1"] + [ "A" + str( i ) for i in range( n ) ] + ["CP2"]
+    edges = [(0, 1)]
+    for i in range( n ):
+        edges += [ ( 1, i + 2 ), ( i + 2, n + 2 ) ]
+    nw = igraph.Graph( n + 3, edges, True )
+    nw.es['sia'] = ["a"] + [ c + str( i ) for i in range( n )
+            for c in ( "a", "b" ) ]
+    nw.vs['sia'] = names
+    chain = [ ( i, i + 1 ) for i in range( n ) ] + [(n, 0)]
+    gs = [ createBox( "A", [(0,0)], ["a!"] ),
+            createBox( "CP1", chain, ["a?"] + [ "a" + str( i ) + "!"
+                for i in range( n ) ] ) ]
+    for i in range( n ):
+        gs.append( createBox( "A" + str( i ), [(0,1),(1,0)],
+            [ "a" + str( i ) + "?", "b" + str( i ) + "!" ] ) )
+    gs.append( createBox( "CP2", chain, [ "b" + str( i ) + "?"
+        for i in range( n ) ] + ["b!"] ) )
+    return nw, gs
+
+# the benchmark families with their default sizes, the largest sizes take
+# long enough for the comparison with a baseline (see `compareRecords`)
+FAMILIES = {
+    "ring": ( createRing, [6, 7, 8, 9] ),
+    "pipeline": ( createPipeline, [12, 14, 16] ),
+    "forkjoin": ( createForkJoin, [6, 8, 10] ),
+    "buffer": ( createPipeline, [8, 16, 32] )
+}
+
+def resetMaxRss():
+    """reset the peak memory of the process to its current memory, this is
+    only supported by Linux, elsewhere the peak memory of the process so far
+    is measured"""
+    try:
+        with open( "/proc/self/clear_refs", "w" ) as f:
+            f.write( "5" )
+    except IOError:
+        pass
+
+def getMaxRss():
+    """get the peak memory of the process in kB since the last reset"""
+    return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+
+def runBenchmark( job ):
+    """run the phases of the check of one network and measure each phase,
+    this is called in a fresh worker process such that the peak memory
+    belongs to this network"""
+    family, size, method = job
+    create = FAMILIES[family][0]
+    if family == "buffer":
+        # a pipeline of three stages where each stage has a buffer of
+        # length `size`
+        nw, gs = create( 3 )
+        pnsc = sia.PnscBuffer( nw, gs, buf_len=size, method=method )
+    else:
+        nw, gs = create( size )
+        pnsc = sia.Pnsc( nw, gs, method=method )
+    phases = []
+    def measure( name, run ):
+        resetMaxRss()
+        start = time.time()
+        run()
+        phases.append( { 'phase': name, 'time': time.time() - start,
+            'maxrss': getMaxRss() } )
+    def fold():
+        pnsc.sia, pnsc.nw_abst = pnsc._fold_chain( pnsc.nw.copy() )
+    measure( "fold", fold )
+    measure( "collapse", pnsc._collapse )
+    measure( "propagate", lambda: pnsc._propagate_info( pnsc.g_cl ) )
+    measure( "expand", pnsc._expand )
+    measure( "blocking", pnsc._set_blocking_info )
+    measure( "separate", pnsc._separate_blocker )
+    folds = [ dict( ( key, step[key] ) for key in ( 'name', 'time',
+        'states_full', 'edges_full', 'states', 'edges' ) )
+        for step in pnsc.stats.folds ]
+    return { 'family': family, 'size': size, 'method': method,
+            'states': pnsc.sia.g.vcount(), 'edges': pnsc.sia.g.ecount(),
+            'clusters': pnsc.g_cl.vcount(), 'blocking': pnsc.is_blocking(),
+            'phases': phases, 'folds': folds }
+
+def runBenchmarks( jobs ):
+    """run each benchmark job in its own worker process"""
+    for job in jobs:
+        pool = multiprocessing.Pool( 1 )
+        try:
+            yield pool.apply( runBenchmark, ( job, ) )
+        finally:
+            pool.close()
+            pool.join()
+
+def printRecord( record ):
+    print "%-9s %4d %8d %8d %8d" % ( record['family'], record['size'],
+            record['states'], record['edges'], record['clusters'] ),
+    print " ".join( "%9.4f" % phase['time'] for phase in record['phases'] ),
+    print "%9d" % max( phase['maxrss'] for phase in record['phases'] )
+
+def compareRecords( records, baseline, tolerance ):
+    """get the phases which are slower than in the baseline by more than the
+    factor `tolerance`, phases faster than 10ms in the baseline are ignored"""
+    base = dict( ( ( r['family'], r['size'], r['method'] ), r )
+            for r in baseline )
+    slow = []
+    for record in records:
+        key = ( record['family'], record['size'], record['method'] )
+        if key not in base:
+            continue
+        times = dict( ( p['phase'], p['time'] )
+                for p in base[key]['phases'] )
+        for phase in record['phases']:
+            t = times.get( phase['phase'] )
+            if t is not None and t > 0.01 \
+                    and phase['time'] > tolerance*t:
+                slow.append( ( key, phase['phase'], t, phase['time'] ) )
+    return slow
+
+def main():
+    """main program entry point"""
+    parser = argparse.ArgumentParser( 'This script measures the time and the peak memory of each phase of the PNSC check on scalable synthetic networks' )
+    parser.add_argument( '--family', metavar="FAMILY", dest='families', action='append', choices=sorted( FAMILIES ), help='run the family FAMILY, can be given more than once (default: all families)' )
+    parser.add_argument( '-n', metavar="SIZE", dest='sizes', type=int, action='append', help='run the size SIZE instead of the default sizes of the families, can be given more than once, the size of the buffer family is the buffer length' )
+    parser.add_argument( '-m', metavar="METHOD", dest='method', choices=['product', 'vector', 'reach'], default='product', help='set the fold method (default: product)' )
+    parser.add_argument( '-o', metavar="OUTFILE", dest='output', default=None, help='write the results as JSON to OUTFILE' )
+    parser.add_argument( '--compare', metavar="BASELINE", dest='baseline', default=None, help='compare the results with the JSON results BASELINE of an earlier run, the exit status is 1 if a phase is slower' )
+    parser.add_argument( '--tolerance', metavar="FACTOR", dest='tolerance', type=float, default=1.5, help='set the factor by which a phase may be slower than in the baseline (default: 1.5)' )
+    args = parser.parse_args()
+
+    jobs = []
+    for family in args.families or sorted( FAMILIES ):
+        for size in args.sizes or FAMILIES[family][1]:
+            jobs.append( ( family, size, args.method ) )
+
+    print "%-9s %4s %8s %8s %8s" % ( "family", "size", "states", "edges",
+            "clusters" ),
+    print " ".join( "%9s" % phase for phase in ( "fold", "collapse",
+        "propagate", "expand", "blocking", "separate" ) ),
+    print "%9s" % "maxrss"
+    records = []
+    for record in runBenchmarks( jobs ):
+        printRecord( record )
+        records.append( record )
+
+    if args.output is not None:
+        with open( args.output, 'w' ) as f:
+            json.dump( records, f, indent=1, sort_keys=True )
+    if args.baseline is not None:
+        with open( args.baseline ) as f:
+            baseline = json.load( f )
+        slow = compareRecords( records, baseline, args.tolerance )
+        for key, phase, t_base, t in slow:
+            print "slower: %s %d %s %s %.4fs -> %.4fs" % ( key[0], key[1],
+                    key[2], phase, t_base, t )
+        if len( slow ) > 0:
+            sys.exit( 1 )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,34 +9,135 @@ __email__ = "s.maurer@herts.ac.uk"
 __status__ = "Prototype"
 
 import igraph, sia
-import sys, argparse
+import json, os, sys, time, argparse
 import igraph.vendor.texttable
 
 sys.settrace
 parser = argparse.ArgumentParser('This script performs the folding operation on interface automata passed as graphml files')
 parser.add_argument( '-p', '--plot', action='store_true', help='plot the graph of the folded system' )
 parser.add_argument( '-f', metavar="FORMAT", dest='format', choices=['graphml', 'gml'], default='graphml', help='set the format of the input graph (default: graphml)' )
-parser.add_argument( '-o', metavar="OUTFILE", dest='output', default='out', help='set the output path of the result (default: out.[FORMAT])' )
-parser.add_argument( 'net', metavar="NET", nargs=1, help='the dependency graph of the PNSC' )
-parser.add_argument( 'infiles', nargs='+', metavar="INFILE", help="the graph files to be folded" )
+parser.add_argument( '-m', metavar="METHOD", dest='method', choices=['product', 'vector', 'reach'], default='product', help='set the fold method: build the full product, build the full product with numpy, or only build the reachable states (default: product)' )
+parser.add_argument( '-e', metavar="ENGINE", dest='engine', choices=['explicit', 'symbolic', 'por'], default='explicit', help='set the engine: fold the systems explicitly, compute the blocking information with binary decision diagrams, or explore the product with partial order reduction, only the explicit engine writes an output graph (default: explicit)' )
+parser.add_argument( '--order', metavar="ORDER", dest='order', choices=sorted( sia.FOLD_ORDERS.keys() ), default='sequential', help='set the order in which the systems are folded (default: sequential)' )
+parser.add_argument( '-j', metavar="PROCESSES", dest='processes', type=int, default=None, help='fold pairs of systems in parallel along a binary tree with PROCESSES worker processes, 0 uses all CPU cores (default: fold sequentially)' )
+parser.add_argument( '-r', metavar="REDUCTION", dest='reduce', choices=['strong', 'weak'], default=None, help='reduce the intermediate folds up to the given equivalence (default: no reduction)' )
+parser.add_argument( '--cache', metavar="DIR", dest='cache', default=None, help='load unchanged folds from and store new folds in the cache directory DIR (default: no cache)' )
+parser.add_argument( '--cache-size', metavar="MB", dest='cache_size', type=int, default=1024, help='set the size limit of the cache, the least recently used folds are removed first (default: 1024)' )
+parser.add_argument( '--max-states', metavar="STATES", dest='max_states', type=int, default=None, help='abort with exit status 2 before a fold step creates more than STATES states, a step whose full product is too large but whose reachable part is estimated to fit is folded with the reach method (default: no limit)' )
+parser.add_argument( '--max-memory', metavar="MB", dest='max_memory', type=int, default=None, help='like --max-states with the limit given as the estimated memory of a fold step (default: no limit)' )
+parser.add_argument( '--fail-fast', action='store_true', dest='fail_fast', help='stop at the first blocking state and print the path to it instead of folding the systems, the exit status is 1 if a state is blocking' )
+parser.add_argument( '-t', metavar="TRACES", dest='traces', type=int, default=0, help='print a shortest trace to at most TRACES blocking states of each blocking local state, a negative number prints all traces (default: 0)' )
+parser.add_argument( '--batch', metavar="MANIFEST", dest='batch', default=None, help='check all networks listed in the JSON file MANIFEST in a pool of PROCESSES worker processes and write one JSON result record per line to OUTFILE (default: stdout), the exit status is 1 if a network is blocking or cannot be checked' )
+parser.add_argument( '--profile', action='store_true', help='print the time, the shared actions and the number of states and edges before and after the pruning of each fold step and the time of each analysis phase' )
+parser.add_argument( '-w', '--watch', action='store_true', help='keep running and check again whenever NET or an INFILE changes, only the folds depending on the changed files are recomputed' )
+parser.add_argument( '-o', metavar="OUTFILE", dest='output', default='out', help='set the output path of the result, an OUTFILE ending in .sia is written in a compact binary format (default: out.[FORMAT])' )
+parser.add_argument( 'net', metavar="NET", nargs='?', help='the dependency graph of the PNSC, or a JSON file listing the boxes and their ports from which the channels are inferred' )
+parser.add_argument( 'infiles', nargs='*', metavar="INFILE", help="the graph files to be folded, with a JSON network the automata may also be given in the JSON file" )
 args = parser.parse_args()
+if args.net is None and args.batch is None:
+    parser.error( "NET is required unless --batch is used" )
 
 def main():
     """main program entry point"""
-    g_arr = []
-    for gf in args.infiles:
-        g_arr.append( igraph.load( gf, format=args.format ) )
-    net = igraph.load( args.net[0], format=args.format )
+    if args.batch is not None:
+        batch()
+    net, g_arr = sia.loadInput( args.net, args.infiles, args.format )
 
-    pnsc = sia.Pnsc( net, g_arr )
-    pnsc.fold()
-    pnsc.print_error()
+    cache = None
+    if args.cache is not None:
+        cache = sia.FoldCache( args.cache, args.cache_size << 20 )
+    max_memory = None
+    if args.max_memory is not None:
+        max_memory = args.max_memory << 20
+    pnsc = sia.Pnsc( net, g_arr, method=args.method, order=args.order,
+            processes=args.processes, reduce=args.reduce, cache=cache,
+            incremental=args.watch, engine=args.engine,
+            max_states=args.max_states, max_memory=max_memory )
+    if args.output == parser.get_default( 'output' ):
+        args.output = args.output + "." + args.format
+
+    if args.fail_fast:
+        blocking = pnsc.find_blocker()
+        pnsc.print_error_first( blocking )
+        sys.exit( 0 if blocking is None else 1 )
+
+    try:
+        pnsc.fold()
+    except sia.BudgetExceeded as e:
+        print "ERROR: " + str( e )
+        sys.exit( 2 )
+    report( pnsc )
+    if args.watch: watch( pnsc )
+
+def batch():
+    """check the networks of a manifest and exit"""
+    entries = sia.loadManifest( args.batch )
+    for entry in entries:
+        entry.setdefault( 'format', args.format )
+        entry.setdefault( 'method', args.method )
+        entry.setdefault( 'order', args.order )
+        entry.setdefault( 'reduce', args.reduce )
+        entry.setdefault( 'engine', args.engine )
+        entry.setdefault( 'max_states', args.max_states )
+        if args.max_memory is not None:
+            entry.setdefault( 'max_memory', args.max_memory << 20 )
+    out = sys.stdout
+    if args.output != parser.get_default( 'output' ):
+        out = open( args.output, 'w' )
+    failed = False
+    for record in sia.checkBatch( entries, args.processes ):
+        out.write( json.dumps( record, sort_keys=True ) + "\n" )
+        out.flush()
+        failed = failed or record['verdict'] != "live"
+    if out is not sys.stdout:
+        out.close()
+    sys.exit( 1 if failed else 0 )
+
+def load( gf ):
+    """load the graph of a box"""
+    if args.net.endswith( ".json" ):
+        return sia.loadAutomaton( gf, args.format )
+    return igraph.load( gf, format=args.format )
+
+def report( pnsc ):
+    """print the errors and write the result"""
+    pnsc.print_error( args.traces )
+    if args.profile: pnsc.stats.print_stats()
+    if pnsc.sia is None: return
 
     if args.plot: pnsc.sia.save()
 
-    if args.output == parser.get_default( 'output' ):
-        args.output = args.output + "." + args.format
-    pnsc.sia.g.save( args.output )
+    pnsc.sia.write( args.output )
+
+def watch( pnsc ):
+    """check again whenever NET or an input file changes, if NET changes the
+    network and all automata are loaded again, stop with CTRL-C"""
+    files = [args.net] + args.infiles
+    mtimes = dict( ( gf, os.path.getmtime( gf ) ) for gf in files )
+    try:
+        while True:
+            time.sleep( 1 )
+            changed = []
+            for gf in files:
+                mtime = os.path.getmtime( gf )
+                if mtime != mtimes[gf]:
+                    mtimes[gf] = mtime
+                    print "changed: " + gf
+                    changed.append( gf )
+            if len( changed ) > 0:
+                try:
+                    if args.net in changed:
+                        net, g_arr = sia.loadInput( args.net, args.infiles,
+                                args.format )
+                        pnsc.update( g_arr, nw=net )
+                    else:
+                        pnsc.update( [ load( gf ) for gf in changed ] )
+                except sia.BudgetExceeded as e:
+                    print "ERROR: " + str( e )
+                    continue
+                report( pnsc )
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
@@ -1,6 +1,129 @@
 #!/usr/bin/env python
 
-import igraph, time
+import array, hashlib, igraph, json, multiprocessing, os, struct, tempfile
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# name of the silent actions, i.e. internal actions that are hidden because no
+# other system can synchronize with them
+SILENT = ""
+
+# the edge attributes of a SIA
+EDGE_ATTRS = ( 'name', 'pname', 'mode', 'sys' )
+
+# the first bytes of a file in the binary format, see `SiaFile`
+SIA_MAGIC = "SIA\x01"
+# the arrays of the binary format are little endian
+_NATIVE_LE = struct.pack( '=i', 1 ) == struct.pack( '<i', 1 )
+
+# the rough peak memory in bytes per state and per edge of a fold, including
+# the igraph attributes and the analysis of the fold
+FOLD_STATE_BYTES = 256
+FOLD_EDGE_BYTES = 384
+
+class BudgetExceeded( ValueError ):
+    """raised if the fold of the systems `step` would exceed the budget of
+    `limit` states"""
+    def __init__( self, msg, step=None, states=None, limit=None ):
+        super( BudgetExceeded, self ).__init__( msg )
+        self.step = step
+        self.states = states
+        self.limit = limit
+
+    def __reduce__( self ):
+        return ( BudgetExceeded, ( self.args[0], self.step, self.states,
+            self.limit ) )
+
+class StateTable( object ):
+    """table of the local subsystem states of a SIA
+
+    The table holds one column per subsystem (in the order of `systems`) and
+    one row per state of the SIA.  The local state indices are stored in a flat
+    integer array such that no per-state container is required."""
+    def __init__( self, systems, data=() ):
+        self.systems = list( systems )
+        self.width = len( self.systems )
+        self.data = array.array( 'i', data )
+        self._cols = dict( ( name, idx ) for idx, name
+                in enumerate( self.systems ) )
+
+    def __len__( self ):
+        if self.width == 0:
+            return 0
+        return len( self.data ) // self.width
+
+    def get( self, v, name ):
+        """get the local state of system `name` in state `v`"""
+        return self.data[v*self.width + self._cols[name]]
+
+    def get_column( self, name ):
+        """get the local states of system `name` in all states"""
+        return self.data[self._cols[name]::self.width]
+
+    def cross( self, other ):
+        """create the table of the full cross product of this table and the
+        table `other`, the row index of the state pair (q, r) is
+        q*len( other ) + r"""
+        n1 = len( self )
+        n2 = len( other )
+        if numpy is None or self.width == 0 or other.width == 0:
+            return self.product( other, ( ( q, r ) for q in range( n1 )
+                for r in range( n2 ) ) )
+        rows1 = numpy.frombuffer( self.data, dtype=numpy.intc ).reshape(
+                n1, self.width )
+        rows2 = numpy.frombuffer( other.data, dtype=numpy.intc ).reshape(
+                n2, other.width )
+        rows = numpy.hstack( ( numpy.repeat( rows1, n2, axis=0 ),
+            numpy.tile( rows2, ( n1, 1 ) ) ) )
+        table = StateTable( self.systems + other.systems )
+        table.data.fromstring( rows.astype( numpy.intc ).tostring() )
+        return table
+
+    def get_mask( self, name ):
+        """get the bitmask of system `name` as used by the edge attribute `sys`
+        and the vertex attribute `action`"""
+        return 1 << self._cols[name]
+
+    def get_systems( self, mask ):
+        """get the list of system names encoded in the bitmask `mask`"""
+        return [ name for idx, name in enumerate( self.systems )
+                if mask >> idx & 1 ]
+
+    def get_dict( self, v ):
+        """get a dict mapping the system names to the local states of `v`"""
+        return dict( zip( self.systems, self.get_row( v ) ) )
+
+    def get_row( self, v ):
+        """get the local states of all systems in state `v`"""
+        return tuple( self.data[v*self.width:(v + 1)*self.width] )
+
+    def product( self, other, pairs ):
+        """create the table of a folded SIA where each state is a pair of
+        states from this table and the table `other`"""
+        table = StateTable( self.systems + other.systems )
+        w1 = self.width
+        w2 = other.width
+        data1 = self.data
+        data2 = other.data
+        data = table.data
+        for q, r in pairs:
+            data.extend( data1[q*w1:(q + 1)*w1] )
+            data.extend( data2[r*w2:(r + 1)*w2] )
+        return table
+
+    def select( self, vids ):
+        """create a table holding only the rows of the states `vids`"""
+        table = StateTable( self.systems )
+        w = self.width
+        data = self.data
+        for v in vids:
+            table.data.extend( data[v*w:(v + 1)*w] )
+        return table
+
 
 class Sia( object ):
     def __init__( self, g ):
@@ -10,17 +133,20 @@ class Sia( object ):
         else:
             self.name = g["sia"]
         self.g = g.copy()
+        self._reset_index()
+        end = None
+        if "end" in self.g.vs.attributes():
+            end = self.g.vs['end']
         self._init_attr()
         self.g.vs[0]['init'] = True
         self._mark_end()
+        if end is not None:
+            # states without outgoing edges are end states in any case
+            self.g.vs['end'] = [ flag == 1 or is_end for flag, is_end
+                    in zip( end, self.g.vs['end'] ) ]
         if( "pname" not in self.g.es.attributes() ):
             self.g.es['pname'] = self.g.es['name']
-        for v in self.g.vs():
-            v['subsys'] = { self.name: v.index }
-        sys = []
-        sys.append( self.name )
-        for e in self.g.es:
-            e['sys'] = list( sys )
+        self._init_subsys()
         # plot(g)
 
     def _init_attr( self ):
@@ -30,6 +156,11 @@ class Sia( object ):
         self.g.vs['ok'] = False
         self.g.vs['reach'] = False
 
+    def _init_subsys( self ):
+        """initialize the SIA as one single system"""
+        self.states = StateTable( [self.name], range( self.g.vcount() ) )
+        self.g.es['sys'] = self.states.get_mask( self.name )
+
     def _mark_end( self ):
         self.g.vs( _outdegree_eq=0 )['end'] = True
 
@@ -37,9 +168,18 @@ class Sia( object ):
         (vids, starts, parents) = self.g.bfs( self.get_v_init() )
         self.g.vs[vids]['reach'] = True
 
+    def _reset_index( self ):
+        """drop the cached edge indices and the content key, call this whenever
+        the graph changes"""
+        self._edge_index = None
+        self._out_index = None
+        self.key = None
+
     def delete_unreachable( self ):
         self._mark_reach()
+        self.states = self.states.select( self.g.vs.select( reach=True ).indices )
         self.g.delete_vertices( self.g.vs.select( reach=False ) )
+        self._reset_index()
 
     def get_actions( self, v ):
         names = []
@@ -49,9 +189,312 @@ class Sia( object ):
             pnames.append( e['pname'] )
         return ( names, pnames )
 
+    def get_edge_index( self ):
+        """get a dict mapping each action name to the list of its edge ids"""
+        if self._edge_index is None:
+            index = {}
+            if self.g.ecount() > 0:
+                for e_id, name in enumerate( self.g.es['name'] ):
+                    index.setdefault( name, [] ).append( e_id )
+            self._edge_index = index
+        return self._edge_index
+
+    def get_out_index( self ):
+        """get for each state a dict mapping action names to the list of
+        outgoing edge ids"""
+        if self._out_index is None:
+            index = [ {} for v in range( self.g.vcount() ) ]
+            if self.g.ecount() > 0:
+                for e_id, ( src, name ) in enumerate( zip(
+                        self.g.get_edgelist(), self.g.es['name'] ) ):
+                    index[src[0]].setdefault( name, [] ).append( e_id )
+            self._out_index = index
+        return self._out_index
+
+    def get_key( self ):
+        """get a hash of the content of the SIA, the key of a fold is derived
+        from the keys of its operands (see `Pnsc`)"""
+        if self.key is None:
+            g = self.g
+            h = hashlib.sha1()
+            h.update( repr( ( self.name, self.pname, self.states.systems,
+                g.vcount(), self.get_v_init(), g.vs['end'],
+                g.get_edgelist() ) ) )
+            if g.ecount() > 0:
+                h.update( repr( ( g.es['name'], g.es['pname'], g.es['mode'],
+                    g.es['sys'] ) ) )
+            h.update( self.states.data.tostring() )
+            self.key = h.hexdigest()
+        return self.key
+
+    def get_subsys( self, v ):
+        """get a dict mapping the subsystem names to their states in `v`"""
+        return self.states.get_dict( v )
+
+    def get_traces( self, vids ):
+        """get a shortest trace from the initial state to each state in `vids`,
+        see `getTraces`"""
+        return getTraces( self.g, vids, self.get_v_init() )
+
     def get_v_init( self ):
         return self.g.vs.find( init=True ).index
 
+    def _get_edge_labels( self ):
+        """get an integer label for each edge, edges with equal name and mode
+        have the same label"""
+        g = self.g
+        if g.ecount() == 0:
+            return []
+        ids = {}
+        return [ ids.setdefault( label, len( ids ) ) for label
+                in zip( g.es['name'], g.es['mode'] ) ]
+
+    def _get_silent_edges( self, weak=False ):
+        """get for each edge whether it is a silent step to another state,
+        without `weak` no edge is silent"""
+        if not weak or self.g.ecount() == 0:
+            return [ False ] * self.g.ecount()
+        return [ name == SILENT and src != dst for name, ( src, dst )
+                in zip( self.g.es['name'], self.g.get_edgelist() ) ]
+
+    def _get_blocking_rows( self ):
+        """get for each state its row where the systems of its internal edges
+        are replaced by -1, only the other systems may block in the state"""
+        g = self.g
+        masks = [ 0 ] * g.vcount()
+        if g.ecount() > 0:
+            for ( src, dst ), mode, sys in zip( g.get_edgelist(),
+                    g.es['mode'], g.es['sys'] ):
+                if mode == ';':
+                    masks[src] |= sys
+        rows = []
+        for v, mask in enumerate( masks ):
+            row = self.states.get_row( v )
+            if mask:
+                row = tuple( -1 if mask >> idx & 1 else state
+                        for idx, state in enumerate( row ) )
+            rows.append( row )
+        return rows
+
+    def _collapse_silent( self ):
+        """merge the states of each cycle of silent actions into one state
+        with one silent loop holding the systems of all of them"""
+        g = self.g
+        if g.ecount() == 0:
+            return
+        names = g.es['name']
+        sys = g.es['sys']
+        g_tau = g.subgraph_edges( [ e for e, name in enumerate( names )
+            if name == SILENT ], delete_vertices=False )
+        membership = g_tau.clusters().membership
+        init = self.get_v_init()
+        ids = { membership[init]: 0 }
+        reps = [init]
+        for v, c in enumerate( membership ):
+            if c not in ids:
+                ids[c] = len( reps )
+                reps.append( v )
+        if len( reps ) == g.vcount():
+            return
+        es_new = []
+        e_ids = []
+        loops = {}
+        for e, ( src, dst ) in enumerate( g.get_edgelist() ):
+            src = ids[membership[src]]
+            dst = ids[membership[dst]]
+            if src == dst and names[e] == SILENT:
+                if src not in loops:
+                    loops[src] = e
+                    es_new.append( ( src, dst ) )
+                    e_ids.append( e )
+                else:
+                    sys[loops[src]] |= sys[e]
+            else:
+                es_new.append( ( src, dst ) )
+                e_ids.append( e )
+        g_new = igraph.Graph( len( reps ), es_new, directed=True )
+        for attr in g.attributes():
+            g_new[attr] = g[attr]
+        for attr in g.vs.attributes():
+            vals = g.vs[attr]
+            g_new.vs[attr] = [ vals[v] for v in reps ]
+        for attr in g.es.attributes():
+            vals = g.es[attr]
+            if attr == 'sys':
+                vals = sys
+            g_new.es[attr] = [ vals[e] for e in e_ids ]
+        self.g = g_new
+        self.states = self.states.select( reps )
+        self._reset_index()
+
+    def _refine_partition( self, labels, silent ):
+        """get the coarsest stable partition of the states and for each state
+        the systems of the inert steps it reaches"""
+        # a silent edge within a block is inert, an edge leaving a block also
+        # carries the systems its target reaches by inert steps and the stable
+        # states of a block block the same systems in the same local states
+        g = self.g
+        n = g.vcount()
+        es = g.get_edgelist()
+        sys = []
+        if len( es ) > 0:
+            sys = g.es['sys']
+        rows = self._get_blocking_rows()
+        if any( silent ):
+            # a state is processed after the states it reaches silently
+            order = g.subgraph_edges( [ e for e in range( len( es ) )
+                if silent[e] ], delete_vertices=False ).topological_sorting()
+            order.reverse()
+            groups = [ order ]
+        else:
+            # all states are stable, states with other rows never merge
+            index = {}
+            for v in range( n ):
+                index.setdefault( rows[v], [] ).append( v )
+            groups = index.values()
+        block = [ 0 ] * n
+        blocks = []
+        for vs in groups:
+            for v in vs:
+                block[v] = len( blocks )
+            blocks.append( vs )
+        reach = [ 0 ] * n
+        dirty = set( b for b, vs in enumerate( blocks ) if len( vs ) > 1 )
+        if len( dirty ) == 0:
+            return block, reach
+        out = g.get_inclist()
+        pred = g.get_adjlist( mode="in" )
+        sigs = [ None ] * n
+        # only the blocks reaching a block that changed are split again
+        while len( dirty ) > 0:
+            b = dirty.pop()
+            if len( blocks[b] ) == 1:
+                continue
+            changed = []
+            for v in blocks[b]:
+                sig = set()
+                row = rows[v]
+                mask = 0
+                stable = True
+                for e in out[v]:
+                    w = es[e][1]
+                    if silent[e] and block[w] == b:
+                        # None if the stable states reached have other rows,
+                        # such states are split from the block in any case
+                        if stable:
+                            row = sigs[w][1]
+                            stable = False
+                        elif row != sigs[w][1]:
+                            row = None
+                        sig.update( sigs[w][0] )
+                        mask |= sys[e] | reach[w]
+                    else:
+                        sig.add( ( labels[e], sys[e] | reach[w], block[w] ) )
+                sigs[v] = ( frozenset( sig ), row )
+                if mask != reach[v]:
+                    reach[v] = mask
+                    changed.append( v )
+            groups = {}
+            for v in blocks[b]:
+                groups.setdefault( sigs[v], [] ).append( v )
+            if len( groups ) > 1:
+                changed = blocks[b]
+                first = True
+                for vs in groups.itervalues():
+                    if first:
+                        blocks[b] = vs
+                        first = False
+                    else:
+                        for v in vs:
+                            block[v] = len( blocks )
+                        blocks.append( vs )
+                    if len( vs ) == 1:
+                        reach[vs[0]] = 0
+                    else:
+                        dirty.add( block[vs[0]] )
+            for v in changed:
+                for u in pred[v]:
+                    dirty.add( block[u] )
+        return block, reach
+
+    def _quotient( self, block, labels, silent, reach ):
+        """replace the graph by its quotient graph with respect to the
+        partition `block` where each block is its first stable state"""
+        g = self.g
+        if len( set( block ) ) == g.vcount():
+            return
+        es = g.get_edgelist()
+        out = g.get_inclist()
+        init = self.get_v_init()
+        stable = [ True ] * g.vcount()
+        for e, ( src, dst ) in enumerate( es ):
+            if silent[e] and block[src] == block[dst]:
+                stable[src] = False
+        first = {}
+        for v in range( g.vcount() ):
+            if stable[v] and block[v] not in first:
+                first[block[v]] = v
+        ids = { block[init]: 0 }
+        reps = [ first[block[init]] ]
+        for v, b in enumerate( block ):
+            if b not in ids:
+                ids[b] = len( reps )
+                reps.append( first[b] )
+        sys = []
+        if len( es ) > 0:
+            sys = g.es['sys']
+        es_new = []
+        e_ids = []
+        sys_new = []
+        seen = set()
+        for c, v in enumerate( reps ):
+            for e in out[v]:
+                w = es[e][1]
+                key = ( c, labels[e], sys[e] | reach[w], ids[block[w]] )
+                if key not in seen:
+                    seen.add( key )
+                    es_new.append( ( c, key[3] ) )
+                    e_ids.append( e )
+                    sys_new.append( key[2] )
+        g_new = igraph.Graph( len( reps ), es_new, directed=True )
+        for attr in g.attributes():
+            g_new[attr] = g[attr]
+        for attr in g.vs.attributes():
+            vals = g.vs[attr]
+            g_new.vs[attr] = [ vals[v] for v in reps ]
+        g_new.vs['init'] = False
+        g_new.vs[0]['init'] = True
+        if len( e_ids ) > 0:
+            for attr in g.es.attributes():
+                vals = g.es[attr]
+                g_new.es[attr] = [ vals[e] for e in e_ids ]
+            g_new.es['sys'] = sys_new
+        self.g = g_new
+        self.states = self.states.select( reps )
+        self._reset_index()
+
+    def hide( self, visible ):
+        """turn the internal actions that are not in the set `visible` into
+        silent actions, the original name is kept in the attribute pname"""
+        g = self.g
+        if g.ecount() == 0:
+            return
+        g.es['name'] = [ SILENT if mode == ';' and name not in visible
+                else name for name, mode in zip( g.es['name'], g.es['mode'] ) ]
+        self._reset_index()
+
+    def minimize( self, weak=False ):
+        """reduce the graph up to strong bisimulation or with `weak` set up to
+        branching bisimulation of the silent steps (see `_refine_partition`)"""
+        if self.g.vcount() == 0:
+            return
+        if weak:
+            self._collapse_silent()
+        silent = self._get_silent_edges( weak )
+        labels = self._get_edge_labels()
+        block, reach = self._refine_partition( labels, silent )
+        self._quotient( block, labels, silent, reach )
+
     def _plot_preprocess( self ):
         """initialize the graph for plotting"""
         g = self.g
@@ -96,6 +539,23 @@ class Sia( object ):
         igraph.plot( g, layout=g.layout( layout ), bbox=( 0, 0, x, y ) )
         self._plot_postprocess()
 
+    def write( self, out, format=None ):
+        """write the graph to a file, the subsystem states and the edge systems
+        are stored as string attributes, with the format "sia" or a file name
+        ending in ".sia" the binary format is written instead (see
+        `writeSia`)"""
+        if format == "sia" or ( format is None and out.endswith( ".sia" ) ):
+            writeSia( self, out )
+            return
+        g = self.g.copy()
+        g.vs['subsys'] = [ ",".join( [ name + ":" + str( state ) for name, state
+            in zip( self.states.systems, self.states.get_row( v ) ) ] )
+            for v in range( g.vcount() ) ]
+        if g.ecount() > 0:
+            g.es['sys'] = [ ",".join( self.states.get_systems( sys ) )
+                    for sys in g.es['sys'] ]
+        g.save( out, format=format )
+
     def print_stats( self ):
         g = self.g
         print "# of states: " + str( g.vcount() )
@@ -106,24 +566,55 @@ class Sia( object ):
 
 
 class SiaFold( Sia ):
-    def __init__( self, sia1, sia2, shared ):
+    def __init__( self, sia1, sia2, shared, method="product",
+            max_states=None ):
         self.mod = sia2.g.vcount()
-        self.g = igraph.Graph( sia1.g.vcount()*sia2.g.vcount(), directed=True )
-        self._init_attr()
-        self._init_attr_fold( sia1, sia2 )
-        self._fold( sia1.g, sia2.g, shared )
-        self.delete_unreachable()
+        self._reset_index()
+        if max_states is not None and method != "reach" \
+                and sia1.g.vcount()*sia2.g.vcount() > max_states:
+            _raise_budget( sia1, sia2, sia1.g.vcount()*sia2.g.vcount(),
+                    max_states )
+        if method == "product" or method == "vector":
+            self.g = igraph.Graph( sia1.g.vcount()*sia2.g.vcount(),
+                    directed=True )
+            self._init_attr()
+            self._init_attr_fold( sia1, sia2 )
+            if method == "vector":
+                self._fold_vector( sia1, sia2, shared )
+            else:
+                self._fold( sia1, sia2, shared )
+            # the size of the product before the pruning
+            self.size_full = ( self.g.vcount(), self.g.ecount() )
+            self.delete_unreachable()
+        elif method == "reach":
+            self.g = igraph.Graph( directed=True )
+            self._fold_reach( sia1, sia2, shared, max_states )
+            self.size_full = ( self.g.vcount(), self.g.ecount() )
+        else:
+            raise ValueError( "unknown fold method '" + str( method ) + "'" )
         self._mark_end()
         self.set_name( sia1.name + sia2.name, sia1.pname + sia2.pname )
         # print self.print_stats()
 
-    def _fold( self, g1, g2, shared ):
+    def _fold( self, sia1, sia2, shared ):
         """fold two graphs together"""
 
         # print "folding " + g1['name'] + " and " + g2['name'] + " on shared actions: " + str( shared )
         # self.plot( g1 )
         # self.plot( g2 )
 
+        g1 = sia1.g
+        g2 = sia2.g
+        shared = set( shared )
+        index1 = sia1.get_edge_index()
+        index2 = sia2.get_edge_index()
+        es1 = g1.get_edgelist()
+        es2 = g2.get_edgelist()
+        name1, pname1, mode1, sys1 = self._get_edge_attr( g1 )
+        name2, pname2, mode2, sys2 = self._get_edge_attr( g2 )
+        # the systems of g2 are appended to the systems of g1
+        sys2 = [ sys << sia1.states.width for sys in sys2 ]
+
         es = []
         attr_name = []
         attr_pname = []
@@ -132,42 +623,42 @@ class SiaFold( Sia ):
 
         # find shared actions
         for name in shared:
-            for e1 in g1.es( name=name ):
-                for e2 in g2.es( name=name ):
-                    src = self._get_vertex_id( e1.source, e2.source )
-                    dst = self._get_vertex_id( e1.target, e2.target )
+            for e1 in index1.get( name, [] ):
+                for e2 in index2.get( name, [] ):
+                    src = self._get_vertex_id( es1[e1][0], es2[e2][0] )
+                    dst = self._get_vertex_id( es1[e1][1], es2[e2][1] )
                     es.append( (src, dst) )
                     attr_name.append( name )
-                    attr_pname.append( e1['pname'] )
+                    attr_pname.append( pname1[e1] )
                     attr_mode.append( ';' )
-                    attr_sys.append( e1['sys'] + e2['sys'] )
+                    attr_sys.append( sys1[e1] | sys2[e2] )
 
         # find independant actions in g1
-        for act in g1.es:
-            if act['name'] in shared:
+        for e1, ( q_src, q_dst ) in enumerate( es1 ):
+            if name1[e1] in shared:
                 continue
             for idx in range( 0, g2.vcount() ):
-                src = self._get_vertex_id( act.source, idx )
-                dst = self._get_vertex_id( act.target, idx )
+                src = self._get_vertex_id( q_src, idx )
+                dst = self._get_vertex_id( q_dst, idx )
                 es.append( (src, dst) )
-                attr_name.append( act['name'] )
-                attr_pname.append( act['pname'] )
-                attr_mode.append( act['mode'] )
-                attr_sys.append( act['sys'] )
+                attr_name.append( name1[e1] )
+                attr_pname.append( pname1[e1] )
+                attr_mode.append( mode1[e1] )
+                attr_sys.append( sys1[e1] )
         e_start = self.g.ecount()
 
         # find independant actions in g2
-        for act in g2.es:
-            if act['name'] in shared:
+        for e2, ( r_src, r_dst ) in enumerate( es2 ):
+            if name2[e2] in shared:
                 continue
             for idx in range( 0, g1.vcount() ):
-                src = self._get_vertex_id( idx, act.source )
-                dst = self._get_vertex_id( idx, act.target )
+                src = self._get_vertex_id( idx, r_src )
+                dst = self._get_vertex_id( idx, r_dst )
                 es.append( (src, dst) )
-                attr_name.append( act['name'] )
-                attr_pname.append( act['pname'] )
-                attr_mode.append( act['mode'] )
-                attr_sys.append( act['sys'] )
+                attr_name.append( name2[e2] )
+                attr_pname.append( pname2[e2] )
+                attr_mode.append( mode2[e2] )
+                attr_sys.append( sys2[e2] )
 
         self.g.add_edges( es )
         self.g.es[e_start:]['name'] = attr_name
@@ -177,6 +668,146 @@ class SiaFold( Sia ):
 
         # self.plot()
 
+    def _fold_reach( self, sia1, sia2, shared, max_states=None ):
+        """fold two graphs together by exploring the product from the initial
+        state pair, such that only reachable states and edges are created,
+        the exploration is aborted as soon as more than `max_states` states
+        are reached"""
+        g1 = sia1.g
+        g2 = sia2.g
+        shared = set( shared )
+        out1 = sia1.get_out_index()
+        out2 = sia2.get_out_index()
+        dst1 = [dst for src, dst in g1.get_edgelist()]
+        dst2 = [dst for src, dst in g2.get_edgelist()]
+        name1, pname1, mode1, sys1 = self._get_edge_attr( g1 )
+        name2, pname2, mode2, sys2 = self._get_edge_attr( g2 )
+        # the systems of g2 are appended to the systems of g1
+        sys2 = [ sys << sia1.states.width for sys in sys2 ]
+
+        init = ( sia1.get_v_init(), sia2.get_v_init() )
+        pairs = [init]
+        ids = { init: 0 }
+        es = []
+        # the edge ids (e1, e2) of each edge of the fold
+        moves = []
+
+        # breadth first search, pairs grows while it is iterated
+        src = 0
+        while src < len( pairs ):
+            succ, succ_moves = _product_succ( pairs[src], out1, out2, dst1,
+                    dst2, shared )
+            for dst in succ:
+                dst_id = ids.get( dst )
+                if dst_id is None:
+                    dst_id = len( pairs )
+                    ids[dst] = dst_id
+                    pairs.append( dst )
+                es.append( (src, dst_id) )
+            moves += succ_moves
+            if max_states is not None and len( pairs ) > max_states:
+                _raise_budget( sia1, sia2, len( pairs ), max_states )
+            src += 1
+
+        # a synchronized edge is internal and has the name of g1
+        attr_name = [ name2[e2] if e1 is None else name1[e1]
+                for e1, e2 in moves ]
+        attr_pname = [ pname2[e2] if e1 is None else pname1[e1]
+                for e1, e2 in moves ]
+        attr_mode = [ mode2[e2] if e1 is None else mode1[e1] if e2 is None
+                else ';' for e1, e2 in moves ]
+        attr_sys = [ sys2[e2] if e1 is None else sys1[e1] if e2 is None
+                else sys1[e1] | sys2[e2] for e1, e2 in moves ]
+
+        g = self.g
+        g.add_vertices( len( pairs ) )
+        self._init_attr()
+        g.vs[0]['init'] = True
+        g.vs['reach'] = True
+        g.vs['r_end'] = False
+        self.states = sia1.states.product( sia2.states, pairs )
+
+        g.add_edges( es )
+        g.es['name'] = attr_name
+        g.es['pname'] = attr_pname
+        g.es['mode'] = attr_mode
+        g.es['sys'] = attr_sys
+
+    def _fold_vector( self, sia1, sia2, shared ):
+        """fold two graphs together, the edges are computed in bulk with numpy
+        arrays instead of one by one"""
+        if numpy is None:
+            raise ImportError( "the fold method 'vector' requires numpy" )
+        g1 = sia1.g
+        g2 = sia2.g
+        n1 = g1.vcount()
+        n2 = g2.vcount()
+        shared = set( shared )
+        index1 = sia1.get_edge_index()
+        index2 = sia2.get_edge_index()
+        es1 = numpy.array( g1.get_edgelist(), dtype=numpy.int64 ).reshape(
+                -1, 2 )
+        es2 = numpy.array( g2.get_edgelist(), dtype=numpy.int64 ).reshape(
+                -1, 2 )
+        attr1 = [ numpy.array( attr, dtype=object )
+                for attr in self._get_edge_attr( g1 ) ]
+        attr2 = [ numpy.array( attr, dtype=object )
+                for attr in self._get_edge_attr( g2 ) ]
+        # the systems of g2 are appended to the systems of g1
+        attr2[3] = attr2[3] << sia1.states.width
+        srcs = []
+        dsts = []
+        attrs = [ [], [], [], [] ]
+
+        # find shared actions, each edge of g1 is paired with each edge of g2
+        for name in shared:
+            e1 = numpy.array( index1.get( name, [] ), dtype=numpy.int64 )
+            e2 = numpy.array( index2.get( name, [] ), dtype=numpy.int64 )
+            if len( e1 ) == 0 or len( e2 ) == 0:
+                continue
+            e1 = numpy.repeat( e1, len( e2 ) )
+            e2 = numpy.tile( e2, len( e1 ) // len( e2 ) )
+            srcs.append( es1[e1, 0]*n2 + es2[e2, 0] )
+            dsts.append( es1[e1, 1]*n2 + es2[e2, 1] )
+            attrs[0].append( numpy.array( [name]*len( e1 ), dtype=object ) )
+            attrs[1].append( attr1[1][e1] )
+            attrs[2].append( numpy.array( [';']*len( e1 ), dtype=object ) )
+            attrs[3].append( attr1[3][e1] | attr2[3][e2] )
+
+        # find independant actions, each edge of one graph is combined with
+        # each state of the other graph
+        for es, attr, n, stride_e, stride_v in [ ( es1, attr1, n2, n2, 1 ),
+                ( es2, attr2, n1, 1, n2 ) ]:
+            if len( es ) == 0:
+                continue
+            e = numpy.array( [ idx for idx, name in enumerate( attr[0] )
+                if name not in shared ], dtype=numpy.int64 )
+            if len( e ) == 0 or n == 0:
+                continue
+            offset = numpy.tile( numpy.arange( n, dtype=numpy.int64 )*stride_v,
+                    len( e ) )
+            e = numpy.repeat( e, n )
+            srcs.append( es[e, 0]*stride_e + offset )
+            dsts.append( es[e, 1]*stride_e + offset )
+            for idx in range( 4 ):
+                attrs[idx].append( attr[idx][e] )
+
+        if len( srcs ) == 0:
+            return
+        es = numpy.column_stack( ( numpy.concatenate( srcs ),
+            numpy.concatenate( dsts ) ) )
+        self.g.add_edges( es.tolist() )
+        self.g.es['name'] = numpy.concatenate( attrs[0] ).tolist()
+        self.g.es['pname'] = numpy.concatenate( attrs[1] ).tolist()
+        self.g.es['mode'] = numpy.concatenate( attrs[2] ).tolist()
+        self.g.es['sys'] = numpy.concatenate( attrs[3] ).tolist()
+
+    def _get_edge_attr( self, g ):
+        """get the attribute lists of all edges used for folding"""
+        if g.ecount() == 0:
+            return [], [], [], []
+        return g.es['name'], g.es['pname'], g.es['mode'], g.es['sys']
+
     def _get_vertex_id( self, q, r ):
         """calculate the index of the folded state"""
         return self.mod * q + r
@@ -187,11 +818,8 @@ class SiaFold( Sia ):
         g.vs[init_id]['init'] = True
         g.vs['r_end'] = False
 
-        g.vs['subsys'] = {}
-        for v1 in sia1.g.vs:
-            for v2 in sia2.g.vs:
-                idx = self._get_vertex_id( v1.index, v2.index )
-                g.vs[idx]['subsys'] = dict( v1['subsys'], **v2['subsys'] )
+        # the row index of the cross product is the vertex id
+        self.states = sia1.states.cross( sia2.states )
 
     def set_name( self, name, pname=None ):
         if pname is None:
@@ -200,14 +828,813 @@ class SiaFold( Sia ):
         self.pname = pname
         self.g['sia'] = name
         self.g['name'] = pname
+        self.key = None
+
+
+class FoldCache( object ):
+    """persistent cache of folded SIAs
+
+    Each fold is stored in its own file in the directory `path`, the file name
+    is the key of the fold.  The files are in the binary format (see
+    `SiaFile`), a file that is not a SIA file counts as a miss.  If the size
+    of the cache exceeds `max_size` bytes the least recently used files are
+    removed."""
+    def __init__( self, path, max_size=1 << 30 ):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+        self._evict()
+
+    def _get_file( self, key ):
+        return os.path.join( self.path, key + ".sia" )
+
+    def get( self, key ):
+        """get the folded SIA stored under `key` or None if there is none"""
+        path = self._get_file( key )
+        try:
+            sia = SiaFile( path ).to_sia()
+            os.utime( path, None )
+        except ( IOError, OSError, ValueError ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        sia.key = key
+        return sia
+
+    def put( self, key, sia ):
+        """store the folded SIA under `key`, the file is written to a temporary
+        file first such that concurrent readers never see a partial file"""
+        fd, tmp = tempfile.mkstemp( dir=self.path, suffix=".tmp" )
+        os.close( fd )
+        writeSia( sia, tmp )
+        os.rename( tmp, self._get_file( key ) )
+        self._evict()
+
+    def _evict( self ):
+        """remove the least recently used files until the cache fits"""
+        files = []
+        size = 0
+        for name in os.listdir( self.path ):
+            if not name.endswith( ".sia" ):
+                continue
+            path = os.path.join( self.path, name )
+            try:
+                st = os.stat( path )
+            except OSError:
+                continue
+            files.append( ( st.st_mtime, path, st.st_size ) )
+            size += st.st_size
+        files.sort()
+        while size > self.max_size and len( files ) > 0:
+            mtime, path, f_size = files.pop( 0 )
+            try:
+                os.remove( path )
+            except OSError:
+                pass
+            size -= f_size
+
+
+class SiaFile( object ):
+    """SIA stored in the binary format
+
+    The file starts with `SIA_MAGIC`, the length of the header as 32 bit
+    little endian integer and the header as JSON.  The header holds the names,
+    the counts, the initial state, the subsystems, a table of the distinct
+    values of each edge attribute and the position of each array.  The arrays
+    follow the header, each aligned to 8 bytes and stored as little endian
+    integers:
+
+     - `edges`: the source and the target of each edge
+     - `name`, `pname`, `mode`, `sys`: the index of the edge attribute in its
+       table
+     - `end`: the end flag of each state
+     - `blocking`: the blocking flag of each state
+     - `action`: the index of the action bitmask of each state in its table,
+       only stored if the blocking analysis has set the bitmasks
+     - `states`: the state table with one row per state and one column per
+       subsystem
+
+    The arrays are memory mapped if numpy is available and read otherwise."""
+    def __init__( self, path ):
+        self.path = path
+        with open( path, 'rb' ) as f:
+            if f.read( len( SIA_MAGIC ) ) != SIA_MAGIC:
+                raise ValueError( "'" + str( path ) + "' is not a SIA file" )
+            size, = struct.unpack( '<I', f.read( 4 ) )
+            header = json.loads( f.read( size ) )
+        self._start = _align( len( SIA_MAGIC ) + 4 + size )
+        self.name = header['name']
+        self.pname = header['pname']
+        self.v_cnt = header['v_cnt']
+        self.e_cnt = header['e_cnt']
+        self.v_init = header['v_init']
+        self.systems = header['systems']
+        self.tables = header['tables']
+        self._arrays = header['arrays']
+
+    def get_array( self, name ):
+        """get the array `name`"""
+        offset, typecode, cnt = self._arrays[name]
+        offset += self._start
+        if numpy is not None:
+            dtype = numpy.dtype( typecode ).newbyteorder( '<' )
+            if cnt == 0:
+                return numpy.zeros( 0, dtype=dtype )
+            return numpy.memmap( self.path, dtype=dtype, mode='r',
+                    offset=offset, shape=( cnt, ) )
+        data = array.array( typecode )
+        with open( self.path, 'rb' ) as f:
+            f.seek( offset )
+            data.fromstring( f.read( cnt*data.itemsize ) )
+        if not _NATIVE_LE:
+            data.byteswap()
+        return data
+
+    def get_attr( self, attr ):
+        """get the list of values of the edge or state attribute `attr`"""
+        table = self.tables[attr]
+        return [ table[i] for i in self.get_array( attr ) ]
+
+    def get_subsys( self, v ):
+        """get a dict mapping the subsystem names to their states in `v`"""
+        w = len( self.systems )
+        row = self.get_array( 'states' )[v*w:( v + 1 )*w]
+        return dict( zip( self.systems, [ int( q ) for q in row ] ) )
+
+    def to_sia( self ):
+        """create the folded SIA"""
+        edges = array.array( 'i', self.get_array( 'edges' ) )
+        edge_attrs = dict( ( attr, self.get_attr( attr ) )
+                for attr in EDGE_ATTRS )
+        sia = _create_fold( self.name, self.pname, self.v_cnt, self.v_init,
+                self.get_array( 'end' ), edges, edge_attrs, self.systems,
+                array.array( 'i', self.get_array( 'states' ) ) )
+        if 'blocking' in self._arrays:
+            sia.g.vs['blocking'] = [ bool( flag ) for flag
+                    in self.get_array( 'blocking' ) ]
+        if 'action' in self._arrays:
+            sia.g.vs['action'] = self.get_attr( 'action' )
+        return sia
+
+
+class SiaNet( object ):
+    """product of the systems of a dependency graph explored on the fly
+
+    A state of the product is a tuple with the local state of each system.  An
+    action that is a channel of the dependency graph synchronizes the two
+    systems connected by the channel, all other actions are independent.
+    This is the same product as the one computed by folding the systems.
+
+    If `por` is set the exploration is partial order reduced: in a state where
+    a system can only do independent actions, only the actions of this system
+    are explored (ample set).  The other systems cannot change the local state
+    of the system nor disable its actions, such that the omitted orderings
+    lead to the same blocking states.  A state is fully explored if an ample
+    set would close a cycle (cycle proviso), such that no action is postponed
+    forever.  The reduction preserves the blocking systems and their blocking
+    local states."""
+    def __init__( self, nw, systems, por=False ):
+        self.systems = list( systems )
+        self.por = por
+        self.state_cnt = 0
+        idx = dict( ( sia.name, i ) for i, sia in enumerate( self.systems ) )
+        # channel name -> indices of the two synchronizing systems
+        self.channels = {}
+        for e in nw.es:
+            self.channels[e['sia']] = ( idx[nw.vs[e.source]['sia']],
+                    idx[nw.vs[e.target]['sia']] )
+        self.init = tuple( sia.get_v_init() for sia in self.systems )
+        self._out = [ sia.get_out_index() for sia in self.systems ]
+        self._dst = [ [ dst for src, dst in sia.g.get_edgelist() ]
+                for sia in self.systems ]
+        self._mode = [ sia.g.es['mode'] if sia.g.ecount() > 0 else []
+                for sia in self.systems ]
+        self._end = [ sia.g.vs['end'] for sia in self.systems ]
+        # local states with independent actions only, candidates for ample sets
+        self._indep = [ [ len( out ) > 0 and all( self._is_local( i, name )
+            for name in out ) for out in self._out[i] ]
+            for i in range( len( self.systems ) ) ]
+
+    def _is_local( self, i, name ):
+        """check whether the action `name` of system `i` is independent"""
+        ch = self.channels.get( name )
+        return ch is None or i not in ch or ch[0] == ch[1]
+
+    def get_state( self, state ):
+        """get a dict mapping the system names to their states in `state`"""
+        return dict( ( sia.name, q ) for sia, q
+                in zip( self.systems, state ) )
+
+    def get_succ( self, state, system=None ):
+        """get the list of outgoing edges of `state`, each edge is a tuple
+        (name, mode, systems mask, successor) where bit i of the mask is set
+        if system i takes part in the action, if `system` is set only the
+        independent actions of this system are included"""
+        succ = []
+        if system is None:
+            local = enumerate( state )
+        else:
+            local = [( system, state[system] )]
+        for i, q in local:
+            for name, eids in self._out[i][q].iteritems():
+                ch = self.channels.get( name )
+                if ch is None or i not in ch or ch[0] == ch[1]:
+                    for e in eids:
+                        dst = list( state )
+                        dst[i] = self._dst[i][e]
+                        succ.append( ( name, self._mode[i][e], 1 << i,
+                            tuple( dst ) ) )
+                elif ch[0] == i and system is None:
+                    # a synchronized action is added by its first system
+                    j = ch[1]
+                    for e2 in self._out[j][state[j]].get( name, [] ):
+                        for e in eids:
+                            dst = list( state )
+                            dst[i] = self._dst[i][e]
+                            dst[j] = self._dst[j][e2]
+                            succ.append( ( name, ';', ( 1 << i ) | ( 1 << j ),
+                                tuple( dst ) ) )
+        return succ
+
+    def get_blocking( self, state, mask ):
+        """get the indices of the systems that block in `state` if `mask` holds
+        the systems with an action reachable from `state`"""
+        return [ i for i, q in enumerate( state )
+                if not ( mask >> i ) & 1 and not self._end[i][q] ]
+
+    def _expand( self, state, ids, done ):
+        """get the edges of `state` to explore, with partial order reduction
+        these are the independent actions of one system if none of them leads
+        to a state of an incomplete component"""
+        if self.por:
+            for i, q in enumerate( state ):
+                if not self._indep[i][q]:
+                    continue
+                succ = self.get_succ( state, i )
+                if all( ids.get( dst ) is None or done[ids[dst]]
+                        for name, mode, sys, dst in succ ):
+                    return succ
+        return self.get_succ( state )
+
+    def find_blocking( self ):
+        """search the first blocking state, returns None if there is no
+        blocking state and otherwise a tuple (state, systems, trace) where
+        trace is a shortest list of edges (name, mode, state) through the
+        explored states leading from the initial state to the blocking
+        state"""
+        ids = {}
+        for state, blocking in self._search( ids ):
+            return ( self.get_state( state ),
+                    [ self.systems[i].name for i in blocking ],
+                    self.get_traces( [state], ids )[state] )
+        return None
+
+    def find_all_blocking( self ):
+        """get the list of all blocking states as tuples (state, indices of the
+        blocking systems)"""
+        return list( self._search( {} ) )
+
+    def _search( self, ids ):
+        """generate the blocking states
+
+        The product is explored depth first and its strongly connected
+        components are computed on the way (Tarjan).  When a component is
+        complete all states reachable from it are known, such that the
+        blocking condition is checked right away and each blocking state of
+        the component is generated as a tuple (state, indices of the blocking
+        systems).  The dict `ids` is filled with the explored states."""
+        states = [self.init]
+        ids[self.init] = 0
+        low = [0]
+        # actions reachable from each state, final once its component is done
+        mask = [0]
+        done = [False]
+        tarjan = [0]
+        stack = [( 0, self._expand( self.init, ids, done ), 0 )]
+        while len( stack ) > 0:
+            v, succ, pos = stack[-1]
+            if pos < len( succ ):
+                stack[-1] = ( v, succ, pos + 1 )
+                name, mode, sys, dst = succ[pos]
+                w = ids.get( dst )
+                mask[v] |= sys
+                if w is None:
+                    w = len( states )
+                    ids[dst] = w
+                    states.append( dst )
+                    low.append( w )
+                    mask.append( 0 )
+                    done.append( False )
+                    tarjan.append( w )
+                    stack.append( ( w, self._expand( dst, ids, done ), 0 ) )
+                elif done[w]:
+                    mask[v] |= mask[w]
+                else:
+                    low[v] = min( low[v], low[w] )
+                continue
+            stack.pop()
+            if low[v] != v:
+                # v is part of the component of its parent
+                u = stack[-1][0]
+                low[u] = min( low[u], low[v] )
+                mask[u] |= mask[v]
+                continue
+            # v is the root of a complete component
+            scc = []
+            m = 0
+            while True:
+                w = tarjan.pop()
+                scc.append( w )
+                m |= mask[w]
+                if w == v:
+                    break
+            for w in scc:
+                mask[w] = m
+                done[w] = True
+            if len( stack ) > 0:
+                mask[stack[-1][0]] |= m
+            self.state_cnt = len( states )
+            for w in scc:
+                blocking = self.get_blocking( states[w], m )
+                if len( blocking ) > 0:
+                    yield states[w], blocking
+
+    def get_traces( self, targets, states=None ):
+        """get a dict mapping each state of `targets` to a shortest list of
+        edges (name, mode, state) leading from the initial state to it, all
+        traces are taken from one breadth first search, if `states` is set
+        only these states are visited"""
+        parent = { self.init: None }
+        left = set( targets ) - set( parent )
+        queue = [self.init]
+        pos = 0
+        while pos < len( queue ) and len( left ) > 0:
+            state = queue[pos]
+            pos += 1
+            for name, mode, sys, dst in self.get_succ( state ):
+                if dst not in parent and ( states is None or dst in states ):
+                    parent[dst] = ( state, name, mode )
+                    queue.append( dst )
+                    left.discard( dst )
+        traces = {}
+        for target in targets:
+            trace = []
+            state = target
+            while parent[state] is not None:
+                src, name, mode = parent[state]
+                trace.append( ( name, mode, self.get_state( state ) ) )
+                state = src
+            trace.reverse()
+            traces[target] = trace
+        return traces
+
+
+class Bdd( object ):
+    """minimal package of reduced ordered binary decision diagrams
+
+    A function is the id of its root node, the ids 0 and 1 are the constant
+    functions.  The variables are numbered from 0 (top) to `var_cnt` - 1 and
+    all nodes are kept in flat lists, equal nodes are shared by a unique
+    table and the results of all operations are cached."""
+    def __init__( self, var_cnt ):
+        self.var_cnt = var_cnt
+        # the terminals have a variable below all others
+        self._var = [var_cnt, var_cnt]
+        self._lo = [0, 1]
+        self._hi = [0, 1]
+        self._unique = {}
+        self._cache = {}
+
+    def __len__( self ):
+        return len( self._var )
+
+    def node( self, v, lo, hi ):
+        """get the node of `v` ? `hi` : `lo`"""
+        if lo == hi:
+            return lo
+        key = ( v, lo, hi )
+        u = self._unique.get( key )
+        if u is None:
+            u = len( self._var )
+            self._var.append( v )
+            self._lo.append( lo )
+            self._hi.append( hi )
+            self._unique[key] = u
+        return u
+
+    def cube( self, values ):
+        """get the conjunction of the literals in the dict `values` mapping
+        variables to booleans"""
+        f = 1
+        for v in sorted( values, reverse=True ):
+            f = self.node( v, 0, f ) if values[v] else self.node( v, f, 0 )
+        return f
+
+    def _apply( self, op, f, g ):
+        if op == 0:
+            if f == 0 or g == 0: return 0
+            if f == 1 or f == g: return g
+            if g == 1: return f
+        elif op == 1:
+            if f == 1 or g == 1: return 1
+            if f == 0 or f == g: return g
+            if g == 0: return f
+        else:
+            if f == 0 or g == 1 or f == g: return 0
+            if g == 0: return f
+        if op < 2 and f > g:
+            f, g = g, f
+        key = ( op, f, g )
+        r = self._cache.get( key )
+        if r is None:
+            vf = self._var[f]
+            vg = self._var[g]
+            v = min( vf, vg )
+            f0, f1 = ( self._lo[f], self._hi[f] ) if vf == v else ( f, f )
+            g0, g1 = ( self._lo[g], self._hi[g] ) if vg == v else ( g, g )
+            r = self.node( v, self._apply( op, f0, g0 ),
+                    self._apply( op, f1, g1 ) )
+            self._cache[key] = r
+        return r
+
+    def and_( self, f, g ):
+        return self._apply( 0, f, g )
+
+    def or_( self, f, g ):
+        return self._apply( 1, f, g )
+
+    def diff( self, f, g ):
+        """get f and not g"""
+        return self._apply( 2, f, g )
+
+    def exists( self, f, vs ):
+        """quantify the variables in the frozenset `vs` existentially"""
+        if f < 2:
+            return f
+        key = ( 3, f, vs )
+        r = self._cache.get( key )
+        if r is None:
+            v = self._var[f]
+            lo = self.exists( self._lo[f], vs )
+            hi = self.exists( self._hi[f], vs )
+            r = self.or_( lo, hi ) if v in vs else self.node( v, lo, hi )
+            self._cache[key] = r
+        return r
+
+    def and_exists( self, f, g, vs ):
+        """get exists vs: f and g without building f and g"""
+        if f == 0 or g == 0:
+            return 0
+        if f == 1 and g == 1:
+            return 1
+        if f == 1 or f == g:
+            return self.exists( g, vs )
+        if g == 1:
+            return self.exists( f, vs )
+        if f > g:
+            f, g = g, f
+        key = ( 4, f, g, vs )
+        r = self._cache.get( key )
+        if r is None:
+            vf = self._var[f]
+            vg = self._var[g]
+            v = min( vf, vg )
+            f0, f1 = ( self._lo[f], self._hi[f] ) if vf == v else ( f, f )
+            g0, g1 = ( self._lo[g], self._hi[g] ) if vg == v else ( g, g )
+            lo = self.and_exists( f0, g0, vs )
+            if v in vs:
+                if lo == 1:
+                    r = 1
+                else:
+                    r = self.or_( lo, self.and_exists( f1, g1, vs ) )
+            else:
+                r = self.node( v, lo, self.and_exists( f1, g1, vs ) )
+            self._cache[key] = r
+        return r
+
+    def shift( self, f, vs, delta ):
+        """replace each variable v in the frozenset `vs` by v + `delta`, the
+        replacement must not change the order of the variables in `f`"""
+        if f < 2:
+            return f
+        key = ( 5, f, vs, delta )
+        r = self._cache.get( key )
+        if r is None:
+            v = self._var[f]
+            r = self.node( v + delta if v in vs else v,
+                    self.shift( self._lo[f], vs, delta ),
+                    self.shift( self._hi[f], vs, delta ) )
+            self._cache[key] = r
+        return r
+
+    def pick( self, f ):
+        """get a dict with the values of the variables on one path to 1, the
+        variables not on the path can take any value"""
+        if f == 0:
+            return None
+        values = {}
+        while f > 1:
+            if self._hi[f] != 0:
+                values[self._var[f]] = True
+                f = self._hi[f]
+            else:
+                values[self._var[f]] = False
+                f = self._lo[f]
+        return values
+
+    def count( self, f, vs ):
+        """get the number of assignments to the sorted list of variables `vs`
+        that satisfy `f`, `f` must only depend on variables in `vs`"""
+        pos = dict( ( v, i ) for i, v in enumerate( vs ) )
+        pos[self.var_cnt] = len( vs )
+        cnt = { 0: 0, 1: 1 }
+        def count_node( u ):
+            if u not in cnt:
+                i = pos[self._var[u]]
+                cnt[u] = sum( count_node( w ) << ( pos[self._var[w]] - i - 1 )
+                        for w in ( self._lo[u], self._hi[u] ) )
+            return cnt[u]
+        return count_node( f ) << pos[self._var[f]]
+
+
+class SiaSymbolic( object ):
+    """product of the systems of a dependency graph represented with BDDs
+
+    The local state of each system is encoded with binary variables.  Each
+    variable has a copy for the next state which follows it in the variable
+    order.  The transition relation is partitioned into the independent
+    actions of each system and the channels, and each part only refers to the
+    variables of the systems taking part.  The product is the same as the one
+    of `SiaNet`."""
+    def __init__( self, nw, systems ):
+        self.net = SiaNet( nw, systems )
+        self.systems = self.net.systems
+        self._bits = []
+        var_cnt = 0
+        for sia in self.systems:
+            n = max( 1, ( sia.g.vcount() - 1 ).bit_length() )
+            self._bits.append( range( var_cnt, var_cnt + 2*n, 2 ) )
+            var_cnt += 2*n
+        self.bdd = Bdd( var_cnt )
+        self._cur = sorted( v for bits in self._bits for v in bits )
+        self._init_trans()
+        self.reach = None
+
+    def get_cube( self, i, q, nxt=False ):
+        """get the function of system `i` being in local state `q`"""
+        return self.bdd.cube( dict( ( v + nxt, bool( ( q >> j ) & 1 ) )
+            for j, v in enumerate( self._bits[i] ) ) )
+
+    def _get_edges( self, i, eids ):
+        """get the relation of the edges `eids` of system `i`"""
+        bdd = self.bdd
+        es = self.systems[i].g.get_edgelist()
+        f = 0
+        for e in eids:
+            src, dst = es[e]
+            values = {}
+            for j, v in enumerate( self._bits[i] ):
+                values[v] = bool( ( src >> j ) & 1 )
+                values[v + 1] = bool( ( dst >> j ) & 1 )
+            f = bdd.or_( f, bdd.cube( values ) )
+        return f
+
+    def _init_trans( self ):
+        """build the parts of the transition relation, each part is a tuple
+        (systems, relation, current variables, next variables)"""
+        bdd = self.bdd
+        channels = self.net.channels
+        parts = {}
+        for i, sia in enumerate( self.systems ):
+            index = sia.get_edge_index()
+            for name in index:
+                ch = channels.get( name )
+                if ch is None or i not in ch or ch[0] == ch[1]:
+                    key = ( i, )
+                    f = self._get_edges( i, index[name] )
+                elif ch[0] == i:
+                    key = ch
+                    j = ch[1]
+                    f = bdd.and_( self._get_edges( i, index[name] ),
+                        self._get_edges( j, self.systems[j].get_edge_index().get(
+                            name, [] ) ) )
+                else:
+                    continue
+                parts[key] = bdd.or_( parts.get( key, 0 ), f )
+        self.trans = []
+        for key in sorted( parts ):
+            cur = frozenset( v for i in key for v in self._bits[i] )
+            nxt = frozenset( v + 1 for v in cur )
+            self.trans.append( ( key, parts[key], cur, nxt ) )
+
+    def image( self, f ):
+        """get the successors of the states `f`"""
+        bdd = self.bdd
+        r = 0
+        for key, t, cur, nxt in self.trans:
+            r = bdd.or_( r, bdd.shift( bdd.and_exists( f, t, cur ), nxt, -1 ) )
+        return r
+
+    def preimage( self, f ):
+        """get the predecessors of the states `f`"""
+        bdd = self.bdd
+        r = 0
+        for key, t, cur, nxt in self.trans:
+            r = bdd.or_( r, bdd.and_exists( bdd.shift( f, cur, 1 ), t, nxt ) )
+        return r
+
+    def get_state_cube( self, state ):
+        """get the function of the product being in `state`, a tuple with
+        the local state of each system"""
+        f = 1
+        for i, q in enumerate( state ):
+            f = self.bdd.and_( f, self.get_cube( i, q ) )
+        return f
+
+    def get_reach( self ):
+        """get the reachable states, the frontier of each breadth first step
+        is the only set the image is computed of"""
+        if self.reach is None:
+            bdd = self.bdd
+            reach = self.get_state_cube( self.net.init )
+            front = reach
+            while front != 0:
+                front = bdd.diff( self.image( front ), reach )
+                reach = bdd.or_( reach, front )
+            self.reach = reach
+        return self.reach
+
+    def count( self, f ):
+        """get the number of states in `f`"""
+        return self.bdd.count( f, self._cur )
+
+    def get_blocking( self ):
+        """get for each system the reachable states where it blocks, i.e. the
+        states that are not an end state of the system and from where no
+        action of the system is reachable"""
+        bdd = self.bdd
+        reach = self.get_reach()
+        blocking = []
+        for i, sia in enumerate( self.systems ):
+            # states where an action of the system is enabled
+            act = 0
+            for key, t, cur, nxt in self.trans:
+                if i in key:
+                    act = bdd.or_( act, bdd.exists( t, nxt ) )
+            act = bdd.and_( act, reach )
+            front = act
+            while front != 0:
+                front = bdd.diff( bdd.and_( self.preimage( front ), reach ),
+                        act )
+                act = bdd.or_( act, front )
+            end = 0
+            for q in sia.g.vs.select( end=True ).indices:
+                end = bdd.or_( end, self.get_cube( i, q ) )
+            blocking.append( bdd.diff( bdd.diff( reach, act ), end ) )
+        return blocking
+
+    def get_local_states( self, f, i ):
+        """get the local states of system `i` in the states `f`"""
+        bdd = self.bdd
+        f = bdd.exists( f, frozenset( v for j, bits in enumerate( self._bits )
+            if j != i for v in bits ) )
+        return [ q for q in range( self.systems[i].g.vcount() )
+                if bdd.and_( f, self.get_cube( i, q ) ) != 0 ]
+
+    def pick( self, f ):
+        """get one of the states `f` as a tuple with the local state of each
+        system, None if `f` is empty"""
+        values = self.bdd.pick( f )
+        if values is None:
+            return None
+        return tuple( sum( 1 << j for j, v in enumerate( bits )
+            if values.get( v, False ) ) for bits in self._bits )
+
+    def get_state( self, f ):
+        """get a dict mapping the system names to their local states in one of
+        the states `f`"""
+        state = self.pick( f )
+        if state is None:
+            return None
+        return self.net.get_state( state )
+
+    def get_traces( self, targets ):
+        """get a dict mapping each state of `targets` to a shortest list of
+        edges (name, mode, state) leading from the initial state to it, the
+        frontiers of one symbolic breadth first search are kept and each
+        trace is walked back through them"""
+        bdd = self.bdd
+        cubes = dict( ( target, self.get_state_cube( target ) )
+                for target in targets )
+        front = self.get_state_cube( self.net.init )
+        reach = front
+        fronts = []
+        depth = {}
+        while front != 0 and len( depth ) < len( cubes ):
+            for target, f in cubes.iteritems():
+                if target not in depth and bdd.and_( front, f ) != 0:
+                    depth[target] = len( fronts )
+            fronts.append( front )
+            front = bdd.diff( self.image( front ), reach )
+            reach = bdd.or_( reach, front )
+        traces = {}
+        for target, d in depth.iteritems():
+            trace = []
+            state = target
+            for front in reversed( fronts[:d] ):
+                src = self.pick( bdd.and_( self.preimage( cubes.get( state )
+                    or self.get_state_cube( state ) ), front ) )
+                for name, mode, sys, dst in self.net.get_succ( src ):
+                    if dst == state:
+                        break
+                trace.append( ( name, mode, self.net.get_state( state ) ) )
+                state = src
+            trace.reverse()
+            traces[target] = trace
+        return traces
+
+
+class PnscStats( object ):
+    """the sizes and timings of the fold steps and the timings of the phases
+    of one PNSC run"""
+    def __init__( self ):
+        self.folds = []
+        self.phases = []
+
+    def add_fold( self, name, shared_cnt, sia, step=None ):
+        """add a fold step, `step` holds the time of the step and the number
+        of states and edges before ("states_full", "edges_full") and after
+        the pruning of the unreachable states, it is None if the fold was
+        taken from the cache or from the previous run"""
+        fold = { 'name': name, 'shared': shared_cnt,
+                'cached': step is None, 'time': 0.0,
+                'states_full': None, 'edges_full': None,
+                'states': sia.g.vcount(), 'edges': sia.g.ecount(),
+                'states_reduced': sia.g.vcount(),
+                'edges_reduced': sia.g.ecount() }
+        if step is not None:
+            fold.update( step )
+        self.folds.append( fold )
+
+    def add_phase( self, name, duration ):
+        """add the time in seconds of a phase"""
+        self.phases.append( { 'name': name, 'time': duration } )
+
+    def get_dict( self ):
+        """get the stats as a dict which can be dumped as JSON"""
+        return { 'folds': self.folds, 'phases': self.phases }
+
+    def print_stats( self ):
+        for fold in self.folds:
+            print "fold " + fold['name'] + ":",
+            if fold['cached']:
+                print "cached,",
+            else:
+                print "%.4fs," % fold['time'],
+            print str( fold['shared'] ) + " shared actions,",
+            if fold['states_full'] is not None:
+                print str( fold['states_full'] ) + "/" \
+                        + str( fold['edges_full'] ) + " ->",
+            print str( fold['states'] ) + "/" + str( fold['edges'] ),
+            if fold['states_reduced'] != fold['states'] \
+                    or fold['edges_reduced'] != fold['edges']:
+                print "-> " + str( fold['states_reduced'] ) + "/" \
+                        + str( fold['edges_reduced'] ),
+            print "states/edges"
+        for phase in self.phases:
+            print "phase " + phase['name'] + ": %.4fs" % phase['time']
 
 
 class Pnsc( object ):
-    def __init__( self, nw, gs_sia, name="" ):
+    def __init__( self, nw, gs_sia, name="", method="product",
+            order="sequential", processes=None, reduce=None, cache=None,
+            incremental=False, engine="explicit", max_states=None,
+            max_memory=None ):
         self.name = name
         self.nw = nw
+        if engine not in ( "explicit", "symbolic", "por" ):
+            raise ValueError( "unknown engine '" + str( engine ) + "'" )
+        self.engine = engine
+        self.method = method
+        self.order = order
+        self.processes = processes
+        self.reduce = reduce
+        if isinstance( cache, basestring ):
+            cache = FoldCache( cache )
+        self.cache = cache
+        self.incremental = incremental
+        # the budget of a single fold step in states and in bytes
+        self.max_states = max_states
+        self.max_memory = max_memory
+        # the folds of the last run by key, kept in incremental mode
+        self._folds = {}
+        self._folds_used = {}
         self.nw_abst = None
         self.sia = None
+        self.stats = PnscStats()
 
         self._init_systems( gs_sia )
 
@@ -242,56 +1669,85 @@ class Pnsc( object ):
         if self.sia == None:
             print "ERROR: no abstarcted SIA defined"
             return
-        self._collapse()
-        self._propagate_info( self.g_cl, self.g_cl.vs.find( init=True ) )
-        self._expand()
-        self._set_blocking_info()
+        self._run_phase( "collapse", self._collapse )
+        self._run_phase( "propagate", self._propagate_info, self.g_cl )
+        self._run_phase( "expand", self._expand )
+        self._run_phase( "blocking", self._set_blocking_info )
+        self._run_phase( "separate", self._separate_blocker )
+
+    def _analyse_net( self ):
+        """compute the blocking information with a partial order reduced
+        exploration of the product, the states of the blocking information
+        hold one blocking state of the product per local state"""
+        net = SiaNet( self.nw, self.systems, por=True )
+        self.blocker_info = {}
+        for state, blocking in net.find_all_blocking():
+            for i in blocking:
+                info = self.blocker_info.get( self.systems[i].name )
+                if info is None or state[i] not in info[1]:
+                    self._update_blocker_info( net.get_state( state ),
+                            self.systems[i], state[i] )
+        self._separate_blocker()
+
+    def _analyse_symbolic( self ):
+        """compute the blocking information with the symbolic engine, the
+        states of the blocking information hold one blocking state of the
+        product per local state"""
+        net = SiaSymbolic( self.nw, self.systems )
+        self.blocker_info = {}
+        for i, ( sys, blocking ) in enumerate( zip( self.systems,
+                net.get_blocking() ) ):
+            for state in net.get_local_states( blocking, i ):
+                state_pnsc = net.get_state( net.bdd.and_( blocking,
+                    net.get_cube( i, state ) ) )
+                self._update_blocker_info( state_pnsc, sys, state )
         self._separate_blocker()
 
     def _collapse( self ):
-        g_tmp = self.sia.g.copy()
+        """condense the strongly connected components of the folded graph,
+        the edges of the folded graph are visited once to compute the edges
+        between components and the actions on edges within a component"""
+        g = self.sia.g
 
         # create clustering
-        self.clusters = g_tmp.clusters()
+        self.clusters = g.clusters()
+        membership = self.clusters.membership
+
+        # combine the edges between two clusters and assign the systems of
+        # edges within a cluster to the action bitmask of the cluster, each
+        # bitmask holds a bit for each system that has an action
+        actions = [0] * len( self.clusters )
+        es = {}
+        sys = []
+        if g.ecount() > 0:
+            sys = g.es['sys']
+        for e, ( src, dst ) in enumerate( g.get_edgelist() ):
+            src = membership[src]
+            dst = membership[dst]
+            if src == dst:
+                actions[src] |= sys[e]
+            else:
+                es[(src, dst)] = es.get( (src, dst), 0 ) | sys[e]
 
         # create graph from clustering
-        self.g_cl = self.clusters.cluster_graph(
-                combine_vertices={'init':'max', 'end':'max'},
-                combine_edges=False )
-
-        # combine edges and merge their attributes (but do not remove loops, as
-        # the cluster_graph method would)
-        self.g_cl.simplify( loops=False,
-                combine_edges={'sys':self._combine_sys} )
-
-        # init vertex parameters
-        hasAction = {}
-        for sys in self.systems:
-            hasAction[sys.name] = False
-        for v in self.g_cl.vs:
-            v['action'] = dict( hasAction )
-        self.g_cl.vs['visited'] = False
-
-        # assign loop edge attributes to vertices and remove loops
-        loops = self.g_cl.is_loop( self.g_cl.es )
-        es = [e_id for e_id, is_loop in enumerate( loops ) if is_loop]
-        for e_id in es:
-            e = self.g_cl.es[e_id]
-            for sys in e['sys']:
-                self.g_cl.vs[e.target]['action'][sys] = True
-        self.g_cl.delete_edges( es )
-
-    def _combine_sys( self, attrs ):
-        sys = []
-        for attr in attrs:
-            for name in attr:
-                if name not in sys:
-                    sys.append( name )
-        return sys
+        self.g_cl = igraph.Graph( len( self.clusters ), es.keys(),
+                directed=True )
+        self.g_cl.es['sys'] = es.values()
+        self.g_cl.vs['action'] = actions
+        self.g_cl.vs['init'] = False
+        self.g_cl.vs['end'] = False
+        self.g_cl.vs[membership[self.sia.get_v_init()]]['init'] = True
+        self.g_cl.vs.select( sorted( set( membership[v.index]
+            for v in g.vs.select( end=True ) ) ) )['end'] = True
 
     def _expand( self ):
-        for v in self.g_cl.vs:
-            self.sia.g.vs( self.clusters[v.index] )['action'] = v['action']
+        actions = self.g_cl.vs['action']
+        self.sia.g.vs['action'] = [ actions[c]
+                for c in self.clusters.membership ]
+
+    def _get_channels( self, nw ):
+        """get the set of channel names in the dependency graph `nw`"""
+        return set( e['sia'] for e in nw.es )
 
     def _get_dependency( self, name, actions ):
         nw = self.nw
@@ -315,21 +1771,36 @@ class Pnsc( object ):
     def _init_systems( self, gs_sia):
         self.systems = []
         for g_sia in gs_sia:
-            sia = Sia( g_sia )
+            sia = self._init_system( g_sia )
             self.systems.append( sia )
 
-    def _propagate_info( self, g, v_src ):
-        if v_src['visited']:
-            return dict( v_src['action'] )
-        v_src['visited'] = True
-        for e in g.es( g.incident( v_src.index ) ):
-            hasAction = self._propagate_info( g, g.vs[e.target] )
-            for sys in e['sys']:
-                hasAction[sys] = True
-            for sys in hasAction:
-                v_src['action'][sys] |= hasAction[sys]
-
-        return dict( v_src['action'] )
+    def _init_system( self, g_sia ):
+        return Sia( g_sia )
+
+    def _propagate_info( self, g ):
+        """propagate the action bitmasks backwards through the acyclic graph
+        `g` such that each vertex holds the systems with an action in any
+        reachable vertex, the vertices are visited in reverse topological
+        order"""
+        actions = g.vs['action']
+        es = g.get_edgelist()
+        out = g.get_inclist()
+        sys = []
+        if g.ecount() > 0:
+            sys = g.es['sys']
+        for v in reversed( g.topological_sorting() ):
+            hasAction = actions[v]
+            for e in out[v]:
+                hasAction |= actions[es[e][1]] | sys[e]
+            actions[v] = hasAction
+        g.vs['action'] = actions
+
+    def _run_phase( self, name, phase, *args ):
+        """run an analysis phase and record its time"""
+        start = time.time()
+        res = phase( *args )
+        self.stats.add_phase( name, time.time() - start )
+        return res
 
     def _separate_blocker( self ):
         blockers = self.get_blocker_info()
@@ -365,12 +1836,18 @@ class Pnsc( object ):
 
     def _set_blocking_info( self ):
         self.blocker_info = {}
-        for v in self.sia.g.vs():
-            for idx, sys in enumerate( self.systems ):
-                state = v['subsys'][sys.name]
-                if not ( v['action'][sys.name] or sys.g.vs[state]['end'] ):
-                    v['blocking'] = True
-                    self._update_blocker_info( v.index, sys, state )
+        g = self.sia.g
+        actions = g.vs['action']
+        blocking = []
+        for sys in self.systems:
+            end = sys.g.vs['end']
+            mask = self.sia.states.get_mask( sys.name )
+            for v_id, state in enumerate( self.sia.states.get_column(
+                    sys.name ) ):
+                if not ( actions[v_id] & mask or end[state] ):
+                    blocking.append( v_id )
+                    self._update_blocker_info( v_id, sys, state )
+        g.vs.select( blocking )['blocking'] = True
 
     def _update_blocker_info( self, state_pnsc, sys, state ):
         name = sys.name
@@ -425,15 +1902,200 @@ class Pnsc( object ):
         """check wheteher sia has permanent blocking state"""
         return ( len( self.get_blocker() ) > 0 )
 
-    def fold( self, plot=False ):
-        sia1 = self.systems[0]
-        nw_inc = self.nw.copy()
-        for sia2 in self.systems[1:]:
+    def _get_order( self ):
+        """get the fold order strategy"""
+        if callable( self.order ):
+            return self.order
+        if self.order not in FOLD_ORDERS:
+            raise ValueError( "unknown fold order '" + str( self.order ) + "'" )
+        return FOLD_ORDERS[self.order]
+
+    def _fold_chain( self, nw_inc ):
+        """fold the systems one by one in the order given by the fold order
+        strategy"""
+        order = self._get_order()
+        systems = list( self.systems )
+        sia1 = order( self, nw_inc, None, systems )
+        systems.remove( sia1 )
+        sia = sia1
+        while len( systems ) > 0:
+            sia2 = order( self, nw_inc, sia1, systems )
+            systems.remove( sia2 )
             shared = self._get_shared( nw_inc, sia1.name, sia2.name )
-            sia = SiaFold( sia1, sia2, shared )
+            # only the intermediate folds are reduced
+            reduce = self.reduce if len( systems ) > 0 else None
+            visible = self._get_channels( nw_inc ) - set( shared )
+            sia = self._fold_jobs( [( sia1, sia2, shared, self.method, reduce,
+                visible )] )[0]
             nw_inc = self._abstract_nw( nw_inc, sia1, sia2, shared, sia.name )
             sia1 = sia
             # igraph.plot( nw_inc )
+        return sia, nw_inc
+
+    def _fold_tree( self, nw_inc ):
+        """fold the systems pairwise along a balanced binary tree, the folds of
+        one tree level are independent and are computed in a process pool"""
+        pool = None
+        if self.processes != 1:
+            pool = multiprocessing.Pool( self.processes or None )
+        systems = list( self.systems )
+        try:
+            while len( systems ) > 1:
+                pairs, systems = self._pair_systems( nw_inc, systems )
+                # only the intermediate folds are reduced
+                reduce = self.reduce
+                if len( pairs ) == 1 and len( systems ) == 0:
+                    reduce = None
+                channels = self._get_channels( nw_inc )
+                jobs = []
+                for sia1, sia2 in pairs:
+                    shared = self._get_shared( nw_inc, sia1.name, sia2.name )
+                    jobs.append( ( sia1, sia2, shared, self.method, reduce,
+                        channels - set( shared ) ) )
+                results = self._fold_jobs( jobs, pool )
+                for job, sia in zip( jobs, results ):
+                    sia1, sia2, shared = job[:3]
+                    nw_inc = self._abstract_nw( nw_inc, sia1, sia2, shared,
+                            sia.name )
+                    systems.append( sia )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return systems[0], nw_inc
+
+    def _fold_jobs( self, jobs, pool=None ):
+        """run the fold jobs, if a cache is set the folds found in the cache
+        are loaded instead of computed and the computed folds are stored"""
+        if self.cache is None and not self.incremental:
+            keys = [ None ] * len( jobs )
+        else:
+            keys = [ self._get_fold_key( job ) for job in jobs ]
+        results = [ self._get_fold( key ) for key in keys ]
+        todo = [ i for i, sia in enumerate( results ) if sia is None ]
+        jobs = list( jobs )
+        for i in todo:
+            jobs[i] = self._check_budget( jobs[i] )
+        if pool is None:
+            folded = map( _fold_job, [ jobs[i] for i in todo ] )
+        else:
+            folded = pool.map( _fold_job, [ jobs[i] for i in todo ] )
+        steps = [ None ] * len( jobs )
+        for i, ( sia, step ) in zip( todo, folded ):
+            if self.cache is not None:
+                self.cache.put( keys[i], sia )
+            results[i] = sia
+            steps[i] = step
+        for job, sia, step in zip( jobs, results, steps ):
+            self.stats.add_fold( sia.name, len( job[2] ), sia, step )
+        for key, sia in zip( keys, results ):
+            if key is not None:
+                sia.key = key
+                if self.incremental:
+                    self._folds_used[key] = sia
+        return results
+
+    def _check_budget( self, job ):
+        """check the size of a fold job against the budget and add the state
+        limit to the job, a product fold exceeding the budget is replaced by
+        a reach fold if the estimated reachable part of the product fits the
+        budget, otherwise `BudgetExceeded` is raised before the fold"""
+        sia1, sia2, shared, method = job[:4]
+        limit = None
+        if self.max_states is not None or self.max_memory is not None:
+            states, edges, reach = estimateFold( sia1, sia2, shared,
+                    samples=0 )
+            limit = self._get_state_limit( float( edges )/max( states, 1 ) )
+            if states > limit:
+                states, edges, reach = estimateFold( sia1, sia2, shared )
+                if reach > limit:
+                    _raise_budget( sia1, sia2, reach, limit, "estimated "
+                            + str( reach ) + " reachable states of "
+                            + str( states ) )
+                method = "reach"
+        return job[:3] + ( method, ) + job[4:6] + ( limit, )
+
+    def _get_state_limit( self, degree ):
+        """get the largest number of states of a fold with the mean out
+        degree `degree` which fits the budget"""
+        limit = self.max_states
+        if self.max_memory is not None:
+            mem = int( self.max_memory
+                    // ( FOLD_STATE_BYTES + degree*FOLD_EDGE_BYTES ) )
+            limit = mem if limit is None else min( limit, mem )
+        return limit
+
+    def _get_fold( self, key ):
+        """get a fold from the previous run or from the cache"""
+        if key is None:
+            return None
+        if key in self._folds:
+            return self._folds[key]
+        if self.cache is not None:
+            return self.cache.get( key )
+        return None
+
+    def _get_fold_key( self, job ):
+        """get the key of a fold job, the key is a hash of the keys of the
+        operands and of all the job parameters that affect the result"""
+        sia1, sia2, shared, method, reduce, visible = job[:6]
+        h = hashlib.sha1()
+        h.update( repr( ( sia1.get_key(), sia2.get_key(), sorted( shared ),
+            method, reduce ) ) )
+        if reduce is not None:
+            # only the visible actions of the operands matter
+            actions = set( sia1.get_edge_index() )
+            actions.update( sia2.get_edge_index() )
+            h.update( repr( sorted( actions & set( visible ) ) ) )
+        return h.hexdigest()
+
+    def _pair_systems( self, nw, systems ):
+        """pair the systems for one level of the fold tree, systems with many
+        shared actions are paired first and the remaining systems are paired
+        in order, returns the pairs and the system left over if any"""
+        idx = dict( ( sia.name, i ) for i, sia in enumerate( systems ) )
+        cnt = {}
+        for e in nw.es:
+            i = idx[nw.vs[e.source]['sia']]
+            j = idx[nw.vs[e.target]['sia']]
+            if i != j:
+                key = ( min( i, j ), max( i, j ) )
+                cnt[key] = cnt.get( key, 0 ) + 1
+        paired = set()
+        pairs = []
+        for ( i, j ) in sorted( cnt, key=lambda key: ( -cnt[key], key ) ):
+            if i not in paired and j not in paired:
+                paired.update( [i, j] )
+                pairs.append( ( i, j ) )
+        rest = [ i for i in range( len( systems ) ) if i not in paired ]
+        while len( rest ) > 1:
+            pairs.append( ( rest.pop( 0 ), rest.pop( 0 ) ) )
+        return [ ( systems[i], systems[j] ) for i, j in pairs ], \
+                [ systems[i] for i in rest ]
+
+    def fold( self, plot=False ):
+        """fold the systems and analyse the blocking of the result, the
+        symbolic and the partial order reduced engine do not fold but compute
+        the blocking information directly and return None"""
+        self.blocker = None
+        self.stats = PnscStats()
+        if self.engine == "symbolic":
+            self._run_phase( "symbolic", self._analyse_symbolic )
+            return None
+        if self.engine == "por":
+            self._run_phase( "por", self._analyse_net )
+            return None
+
+        self._folds_used = {}
+        if self.processes is None:
+            sia, nw_inc = self._run_phase( "fold", self._fold_chain,
+                    self.nw.copy() )
+        else:
+            sia, nw_inc = self._run_phase( "fold", self._fold_tree,
+                    self.nw.copy() )
+        # only keep the folds of this run for the next update
+        self._folds = self._folds_used
+        self._folds_used = {}
 
         self.nw_abst = nw_inc
         self.sia = sia
@@ -443,6 +2105,33 @@ class Pnsc( object ):
 
         return sia
 
+    def find_blocker( self ):
+        """search the first blocking state without folding the systems, the
+        product is explored on the fly and the search stops as soon as a
+        blocking state is confirmed, returns None if no state is blocking and
+        otherwise the tuple (state, systems, trace) (see
+        `SiaNet.find_blocking`)"""
+        return SiaNet( self.nw, self.systems,
+                por=self.engine == "por" ).find_blocking()
+
+    def update( self, gs_sia, plot=False, nw=None ):
+        """replace the systems with the same names as the given graphs and
+        fold again, in incremental mode only the folds depending on a replaced
+        system are computed and the others are taken from the previous run,
+        if the dependency graph `nw` is given it replaces the dependency graph
+        and `gs_sia` replaces all systems"""
+        if nw is not None:
+            self.nw = nw
+            self._init_systems( gs_sia )
+            return self.fold( plot )
+        idx = dict( ( sia.name, i ) for i, sia in enumerate( self.systems ) )
+        for g_sia in gs_sia:
+            sia = self._init_system( g_sia )
+            if sia.name not in idx:
+                raise ValueError( "unknown system '" + str( sia.name ) + "'" )
+            self.systems[idx[sia.name]] = sia
+        return self.fold( plot )
+
     def plot_cl( self, layout="auto", x=1000, y=1000 ):
         """plot the graph"""
         g = self.g_cl
@@ -452,7 +2141,8 @@ class Pnsc( object ):
         g.vs( end=True )['shape'] = "rectangle"
         g.vs['label'] = range( g.vcount() )
         if g.ecount() > 0:
-            g.es['label'] = [ str(n) for n in g.es['sys'] ]
+            g.es['label'] = [ str( self.sia.states.get_systems( n ) )
+                    for n in g.es['sys'] ]
         igraph.plot( g, layout=g.layout( layout ), bbox=( 0, 0, x, y ) )
         del g.vs['color']
         del g.vs['label']
@@ -460,82 +2150,570 @@ class Pnsc( object ):
         if g.ecount() > 0:
             del g.es['label']
 
-    def print_error( self ):
+    def get_traces( self, states=None ):
+        """get a shortest trace to each of the given states of the folded SIA,
+        by default to all blocking states, all traces are taken from one
+        breadth first search (see `getTraces`)
+
+        The engines "por" and "symbolic" do not fold the systems, their
+        states are the product states of the blocking information and the
+        traces are searched in the product (see `SiaNet.get_traces` and
+        `SiaSymbolic.get_traces`), the traces are keyed by
+        `_get_state_key`."""
+        if self.sia is not None:
+            if states is None:
+                states = self.sia.g.vs.select( blocking=True ).indices
+            return self.sia.get_traces( states )
+        if states is None:
+            states = [ state for pname, info in self.blocker_info.values()
+                    for state in info for state in info[state]['states'] ]
+        keys = set( self._get_state_key( state ) for state in states )
+        if self.engine == "symbolic":
+            return SiaSymbolic( self.nw, self.systems ).get_traces( keys )
+        return SiaNet( self.nw, self.systems ).get_traces( keys )
+
+    def _get_state_key( self, state ):
+        """get the key of a state of the blocking information in the result
+        of `get_traces`"""
+        if self.sia is not None:
+            return state
+        return tuple( state[sys.name] for sys in self.systems )
+
+    def _format_trace( self, trace ):
+        """get a trace of `get_traces` as a string of the actions and their
+        modes"""
+        if self.sia is not None:
+            return formatTrace( self.sia.g, trace )
+        return ", ".join( name + mode for name, mode, dst in trace )
+
+    def print_error( self, traces=0 ):
+        """print the blocking systems, if `traces` is not 0 a shortest trace
+        to at most `traces` blocking states (all if negative) of each blocking
+        local state is printed as well"""
         if self.is_blocking():
-            self.print_error_dl( self.get_deadlocker() )
-            self.print_error_lb( self.get_lonelyblocker() )
-
-    def print_error_dl( self, dls ):
+            paths = None
+            if traces != 0:
+                states = []
+                for name, ( pname, info ) in self.blocker_info.iteritems():
+                    for state in info:
+                        vids = info[state]['states']
+                        states.extend( vids if traces < 0 else vids[:traces] )
+                paths = self.get_traces( states )
+            self.print_error_dl( self.get_deadlocker(), paths )
+            self.print_error_lb( self.get_lonelyblocker(), paths )
+
+    def print_error_dl( self, dls, traces=None ):
         for dl in dls:
             print "System '" + self.name + "' has deadlocking source systems"
             for sys in dl:
-                self.print_error_source( sys )
+                self.print_error_source( sys, traces )
 
-    def print_error_lb( self, lbs ):
+    def print_error_lb( self, lbs, traces=None ):
         if len( lbs ) == 0: return
         print "System '" + self.name + "' has lonely blocking source systems"
         for lb in lbs:
-            self.print_error_source( lb )
-
-    def print_error_source( self, sys ):
+            self.print_error_source( lb, traces )
+
+    def print_error_first( self, blocking ):
+        """print a result of `find_blocker`"""
+        if blocking is None: return
+        state, systems, trace = blocking
+        print "System '" + self.name + "' has blocking source systems"
+        print " - " + ", ".join( "'" + name + "'" for name in systems ) \
+                + " in state " + str( state )
+        print "   - path: " + ", ".join( name + mode for name, mode, dst
+                in trace )
+
+    def print_error_source( self, sys, traces=None ):
         print " - '" + self.blocker_info[sys][0] + "' in states"
         for state in self.blocker_info[sys][1]:
             print "   - " + str( state ) + "(" \
                     + str( self.blocker_info[sys][1][state]['states'] ) \
                     + ") on actions " \
                     + str( self.blocker_info[sys][1][state]['actions'][1] )
+            if traces is None: continue
+            for v in self.blocker_info[sys][1][state]['states']:
+                key = self._get_state_key( v )
+                if key in traces:
+                    print "     - trace to " + str( v ) + ": " \
+                            + self._format_trace( traces[key] )
 
 
 class PnscBuffer( Pnsc ):
-    def __init__( self, nw, gs_sia, name="", buf_len=1 ):
+    def __init__( self, nw, gs_sia, name="", buf_len=1, **kwargs ):
         self.buf_len = buf_len
-        super( PnscBuffer, self ).__init__( nw, gs_sia, name )
+        super( PnscBuffer, self ).__init__( nw, gs_sia, name, **kwargs )
 
     def _add_buffer( self, g_sia, buf_len ):
-        """fold each output with a automaton modeling a buffer"""
-        e_buf = []
-        shared = []
+        """build the automaton of a box with a buffer of length `buf_len` at
+        each output port, a state is the state of the box and the fill level
+        of each buffer, the box passes an output to the buffer with the
+        internal action "_queue_" + port name if the buffer is not full and
+        the buffer sends the output to the port if it is not empty, only the
+        reachable states are created"""
+        box = Sia( g_sia )
         q_prefix = "_queue_"
-        for e in g_sia.es( mode='!' ):
-            if e["name"] not in e_buf:
-                e_buf.append( e["name"] )
-                shared.append( q_prefix + e["name"] )
-
-        v_cnt = -1
+        g = box.g
+        es_box = g.get_edgelist()
+        name_box = pname_box = mode_box = []
+        if g.ecount() > 0:
+            name_box = g.es['name']
+            pname_box = g.es['pname']
+            mode_box = g.es['mode']
+        ports = []
+        for name, mode in zip( name_box, mode_box ):
+            if mode == '!' and name not in ports:
+                ports.append( name )
+        # the index of the fill level of a port in a state
+        port_idx = dict( ( name, i ) for i, name in enumerate( ports, 1 ) )
+        out = [ [] for v in range( g.vcount() ) ]
+        for e, ( src, dst ) in enumerate( es_box ):
+            out[src].append( e )
+
+        init = ( box.get_v_init(), ) + ( 0, )*len( ports )
+        states = [init]
+        ids = { init: 0 }
         es = []
         es_name = []
+        es_pname = []
         es_mode = []
-        for name in e_buf:
-            # rename original port
-            q_name = q_prefix + name
-            for e in g_sia.es( name=name ):
-                e["name"] = q_name
-            v_cnt += 1
-            for b_cnt in range( buf_len ):
-                es.append( (v_cnt + b_cnt, v_cnt + b_cnt + 1) )
-                es.append( (v_cnt + b_cnt + 1, v_cnt + b_cnt) )
-                es_name.append( q_name )
-                es_mode.append( '?' )
-                es_name.append( name )
-                es_mode.append( '!' )
-                v_cnt += 1
-
-        g_buf = igraph.Graph( v_cnt, es, directed=True )
-        g_buf['name'] = g_sia['name']
+
+        def add_edge( src, dst, name, pname, mode ):
+            dst_id = ids.get( dst )
+            if dst_id is None:
+                dst_id = len( states )
+                ids[dst] = dst_id
+                states.append( dst )
+            es.append( (src, dst_id) )
+            es_name.append( name )
+            es_pname.append( pname )
+            es_mode.append( mode )
+
+        # breadth first search, states grows while it is iterated
+        src = 0
+        while src < len( states ):
+            state = states[src]
+            for e in out[state[0]]:
+                dst = ( es_box[e][1], ) + state[1:]
+                if mode_box[e] != '!':
+                    add_edge( src, dst, name_box[e], pname_box[e],
+                            mode_box[e] )
+                    continue
+                i = port_idx[name_box[e]]
+                if state[i] < buf_len:
+                    dst = dst[:i] + ( state[i] + 1, ) + dst[i + 1:]
+                    add_edge( src, dst, q_prefix + name_box[e], pname_box[e],
+                            ';' )
+            for i, name in enumerate( ports, 1 ):
+                if state[i] > 0:
+                    dst = state[:i] + ( state[i] - 1, ) + state[i + 1:]
+                    add_edge( src, dst, name, name, '!' )
+            src += 1
+
+        g_buf = igraph.Graph( len( states ), es, directed=True )
+        g_buf['name'] = box.pname
+        g_buf['sia'] = box.name
         g_buf.es['name'] = es_name
+        g_buf.es['pname'] = es_pname
         g_buf.es['mode'] = es_mode
+        # the box ends in its end states once its buffers are empty
+        end = box.g.vs['end']
+        g_buf.vs['end'] = [ end[state[0]] and not any( state[1:] )
+                for state in states ]
+        # the buffered box is one single system in the PNSC
+        return Sia( g_buf )
+
+    def _init_system( self, g_sia ):
+        return self._add_buffer( g_sia, self.buf_len )
+
+
+def _align( size ):
+    """round `size` up to a multiple of 8"""
+    return ( size + 7 ) & ~7
+
+def _intern( values ):
+    """get the table of distinct values and an array with the table index of
+    each value"""
+    ids = {}
+    idx = array.array( 'i', [ ids.setdefault( val, len( ids ) )
+        for val in values ] )
+    table = [ None ] * len( ids )
+    for val, i in ids.iteritems():
+        table[i] = val
+    return table, idx
+
+def _create_fold( name, pname, v_cnt, v_init, end, edges, edge_attrs, systems,
+        data ):
+    """create a folded SIA from its arrays, `edges` is the flat list of the
+    edge end points and `data` holds the rows of the state table"""
+    sia = SiaFold.__new__( SiaFold )
+    sia.g = igraph.Graph( v_cnt, zip( edges[::2], edges[1::2] ),
+            directed=True )
+    sia._reset_index()
+    sia._init_attr()
+    sia.g.vs[v_init]['init'] = True
+    sia.g.vs['end'] = [ bool( flag ) for flag in end ]
+    if sia.g.ecount() > 0:
+        for attr in EDGE_ATTRS:
+            sia.g.es[attr] = edge_attrs[attr]
+    sia.states = StateTable( systems, data )
+    sia.set_name( name, pname )
+    return sia
+
+def _product_succ( pair, out1, out2, dst1, dst2, shared ):
+    """get the edges leaving the pair of states `pair` in the product of two
+    SIAs given by their out indices (see `Sia.get_out_index`) and their edge
+    targets, returns the list of the target pairs and the list of the edge
+    ids (e1, e2) of both SIAs, the id of the SIA that does not move is
+    None"""
+    q, r = pair
+    acts2 = out2[r]
+    succ = []
+    moves = []
+    for name, es_act1 in out1[q].iteritems():
+        if name in shared:
+            es_act2 = acts2.get( name, () )
+            succ += [ ( dst1[e1], dst2[e2] ) for e1 in es_act1
+                    for e2 in es_act2 ]
+            moves += [ ( e1, e2 ) for e1 in es_act1 for e2 in es_act2 ]
+        else:
+            succ += [ ( dst1[e1], r ) for e1 in es_act1 ]
+            moves += [ ( e1, None ) for e1 in es_act1 ]
+    for name, es_act2 in acts2.iteritems():
+        if name not in shared:
+            succ += [ ( q, dst2[e2] ) for e2 in es_act2 ]
+            moves += [ ( None, e2 ) for e2 in es_act2 ]
+    return succ, moves
+
+def _raise_budget( sia1, sia2, states, limit, detail=None ):
+    """raise `BudgetExceeded` for the fold of `sia1` and `sia2` which has
+    `states` states, `detail` describes how the states were counted"""
+    if detail is None:
+        detail = "at least " + str( states ) + " states"
+    raise BudgetExceeded( "the fold of '" + sia1.name + "' and '"
+            + sia2.name + "' exceeds the budget of " + str( limit )
+            + " states (" + detail + ")", ( sia1.name, sia2.name ), states,
+            limit )
+
+def estimateFold( sia1, sia2, shared, samples=1000 ):
+    """estimate the size of the fold of two SIAs, returns the number of states
+    and edges of the full product and an estimate of the number of reachable
+    states, the product is explored from the initial state until `samples`
+    states are found, if no more states are reachable the estimate is exact,
+    otherwise the density of the found states among the explored pairs of
+    local states is extrapolated to the full product"""
+    v1 = sia1.g.vcount()
+    v2 = sia2.g.vcount()
+    shared = set( shared )
+    index1 = sia1.get_edge_index()
+    index2 = sia2.get_edge_index()
+    edges = 0
+    for name, es1 in index1.iteritems():
+        if name in shared:
+            edges += len( es1 )*len( index2.get( name, [] ) )
+        else:
+            edges += len( es1 )*v2
+    for name, es2 in index2.iteritems():
+        if name not in shared:
+            edges += len( es2 )*v1
+    states = v1*v2
+    if samples <= 0:
+        return states, edges, states
+
+    out1 = sia1.get_out_index()
+    out2 = sia2.get_out_index()
+    dst1 = [ dst for src, dst in sia1.g.get_edgelist() ]
+    dst2 = [ dst for src, dst in sia2.g.get_edgelist() ]
+    init = ( sia1.get_v_init(), sia2.get_v_init() )
+    pairs = [init]
+    seen = set( pairs )
+    src = 0
+    while src < len( pairs ) and len( pairs ) < samples:
+        for pair in _product_succ( pairs[src], out1, out2, dst1, dst2,
+                shared )[0]:
+            if pair not in seen:
+                seen.add( pair )
+                pairs.append( pair )
+        src += 1
+    if src == len( pairs ):
+        return states, edges, len( pairs )
+    n1 = len( set( q for q, r in pairs ) )
+    n2 = len( set( r for q, r in pairs ) )
+    return states, edges, min( states, len( pairs )*v1*v2 // ( n1*n2 ) )
+
+def _fold_job( job ):
+    """fold a pair of SIAs, this is called in the worker processes of a
+    parallel fold, returns the fold and the stats of the fold step (see
+    `PnscStats.add_fold`)"""
+    sia1, sia2, shared, method, reduce, visible, max_states = job
+    start = time.time()
+    sia = SiaFold( sia1, sia2, shared, method, max_states )
+    stats = { 'states_full': sia.size_full[0], 'edges_full': sia.size_full[1],
+            'states': sia.g.vcount(), 'edges': sia.g.ecount(),
+            'method': method }
+    if reduce == "strong":
+        sia.minimize()
+    elif reduce == "weak":
+        sia.hide( visible )
+        sia.minimize( weak=True )
+    elif reduce is not None:
+        raise ValueError( "unknown reduction '" + str( reduce ) + "'" )
+    stats['time'] = time.time() - start
+    return sia, stats
+
+def createNetwork( boxes ):
+    """create the dependency graph of a network, the network is a list of dicts
+    with the name of a box ("box") and its ports ("ports", e.g. ["a!", "b?"]),
+    a channel connects the box with the output port "x!" to the box with the
+    input port "x?", a port listed twice by the same box counts once, ports
+    without a counterpart are left open"""
+    ports = { '!': {}, '?': {} }
+    for i, box in enumerate( boxes ):
+        for port in box['ports']:
+            name, mode = port[:-1], port[-1:]
+            if mode not in ports:
+                raise ValueError( "port '" + port + "' of box '" + box['box']
+                        + "' has no mode" )
+            if ports[mode].get( name, i ) != i:
+                raise ValueError( "port '" + port
+                        + "' is used by more than one box" )
+            ports[mode][name] = i
+    channels = sorted( name for name in ports['!'] if name in ports['?'] )
+    nw = igraph.Graph( len( boxes ), [ ( ports['!'][name], ports['?'][name] )
+        for name in channels ], directed=True )
+    nw.vs['sia'] = [ box['box'] for box in boxes ]
+    nw.es['sia'] = channels
+    return nw
+
+def createAutomaton( name, v_cnt, edges, init=0, end=() ):
+    """create the graph of the SIA `name` with `v_cnt` states and the edges
+    given as tuples (source, target, label) where the label is the action name
+    followed by the mode (e.g. "a!"), the initial state becomes state 0 and
+    the states in `end` are marked as end states"""
+    # swap the initial state with state 0
+    perm = list( range( v_cnt ) )
+    perm[0], perm[init] = init, 0
+    g = igraph.Graph( v_cnt, [ ( perm[src], perm[dst] ) for src, dst, label
+        in edges ], directed=True )
+    g['name'] = name
+    labels = [ label for src, dst, label in edges ]
+    for label in labels:
+        if label[-1:] not in ( '!', '?', ';' ):
+            raise ValueError( "action '" + label + "' of '" + name
+                    + "' has no mode" )
+    g.es['name'] = [ label[:-1] for label in labels ]
+    g.es['mode'] = [ label[-1] for label in labels ]
+    g.vs['end'] = False
+    g.vs.select( [ perm[v] for v in end ] )['end'] = True
+    return g
 
-        sia = SiaFold( Sia( g_sia ), Sia( g_buf ), shared )
-        sia.set_name( g_sia['sia'], g_sia['name'] )
-        return sia
-
-
-    def _init_systems( self, gs_sia):
-        self.systems = []
-        for g_sia in gs_sia:
-            sia = self._add_buffer( g_sia, self.buf_len )
-            self.systems.append( sia )
-
+def loadAutomaton( path, format="gml" ):
+    """load the graph of a SIA, the name of the SIA is either the graph
+    attribute "name" or the attribute "name" of an isolated vertex (which is
+    removed), the actions are either given by the edge attributes "name" and
+    "mode" or by the edge attribute "label" (e.g. "a!"), the initial state and
+    the end states may be marked by the vertex attributes "init" and "end"
+    """
+    g = igraph.load( path, format=format )
+    name = g['name'] if "name" in g.attributes() else None
+    keep = list( range( g.vcount() ) )
+    if "name" in g.vs.attributes():
+        for v in g.vs.select( _degree_eq=0 ):
+            if v['name']:
+                name = v['name']
+                keep.remove( v.index )
+    ids = dict( ( v, i ) for i, v in enumerate( keep ) )
+    if g.ecount() == 0:
+        labels = []
+    elif "label" in g.es.attributes():
+        labels = g.es['label']
+    else:
+        labels = [ a + m for a, m in zip( g.es['name'], g.es['mode'] ) ]
+    edges = [ ( ids[src], ids[dst], label ) for ( src, dst ), label
+            in zip( g.get_edgelist(), labels ) ]
+    init = 0
+    end = []
+    if "init" in g.vs.attributes():
+        init = [ ids[v] for v in keep if g.vs[v]['init'] == 1 ][0]
+    if "end" in g.vs.attributes():
+        end = [ ids[v] for v in keep if g.vs[v]['end'] == 1 ]
+    return createAutomaton( name, len( keep ), edges, init, end )
+
+def loadNetwork( path, automata=(), format="gml" ):
+    """load a network from a JSON file (see `createNetwork`), the automaton of
+    a box is either given in the JSON file as dict "automaton" with the keys
+    "states", "edges", "init" and "end" (see `createAutomaton`) or as file in
+    the list `automata` (see `loadAutomaton`), returns the dependency graph
+    and the list of automata graphs in the order of the boxes"""
+    with open( path ) as f:
+        boxes = json.load( f )
+    nw = createNetwork( boxes )
+    graphs = {}
+    for gf in automata:
+        g = loadAutomaton( gf, format )
+        graphs[g['name']] = g
+    gs = []
+    for box in boxes:
+        if "automaton" in box:
+            a = box['automaton']
+            gs.append( createAutomaton( box['box'], a['states'], a['edges'],
+                a.get( 'init', 0 ), a.get( 'end', () ) ) )
+        elif box['box'] in graphs:
+            gs.append( graphs[box['box']] )
+        else:
+            raise ValueError( "no automaton for box '" + box['box'] + "'" )
+    return nw, gs
+
+def loadInput( net, infiles, format="graphml" ):
+    """load the dependency graph `net` and the automata `infiles`, a network
+    ending in ".json" is loaded with `loadNetwork`"""
+    if net.endswith( ".json" ):
+        return loadNetwork( net, infiles, format )
+    gs = [ igraph.load( gf, format=format ) for gf in infiles ]
+    return igraph.load( net, format=format ), gs
+
+def loadManifest( path ):
+    """load a manifest of a batch, the manifest is a JSON list of dicts with
+    the path of the network ("net") and the paths of the automata
+    ("infiles"), relative paths are relative to the manifest (see
+    `checkNetwork` for the optional keys)"""
+    with open( path ) as f:
+        entries = json.load( f )
+    base = os.path.dirname( os.path.abspath( path ) )
+    for entry in entries:
+        entry['net'] = os.path.join( base, entry['net'] )
+        entry['infiles'] = [ os.path.join( base, gf )
+                for gf in entry.get( 'infiles', [] ) ]
+    return entries
+
+def checkNetwork( entry ):
+    """check the network of a batch entry, the entry is a dict with the path
+    of the network ("net"), the paths of the automata ("infiles") and
+    optionally a name ("name"), the input format ("format") and the keyword
+    arguments "method", "order", "reduce", "engine", "max_states" and
+    "max_memory" of `Pnsc`, returns a
+    result record with the verdict ("live", "blocking" or "error"), the
+    blocking systems, the number of states and the timings in seconds"""
+    start = time.time()
+    record = { 'name': entry.get( 'name', entry['net'] ),
+            'net': entry['net'] }
+    try:
+        nw, gs = loadInput( entry['net'], entry.get( 'infiles', [] ),
+                entry.get( 'format', "graphml" ) )
+        loaded = time.time()
+        kwargs = dict( ( key, entry[key] ) for key
+                in ( 'method', 'order', 'reduce', 'engine', 'max_states',
+                    'max_memory' ) if key in entry )
+        pnsc = Pnsc( nw, gs, **kwargs )
+        pnsc.fold()
+        record['verdict'] = "blocking" if pnsc.is_blocking() else "live"
+        record['blocker'] = sorted( pnsc.get_blocker() )
+        record['deadlocker'] = [ sorted( dl ) for dl
+                in pnsc.get_deadlocker() ]
+        record['lonelyblocker'] = sorted( pnsc.get_lonelyblocker() )
+        record['states'] = None
+        if pnsc.sia is not None:
+            record['states'] = pnsc.sia.g.vcount()
+        record['time'] = { 'load': loaded - start,
+                'check': time.time() - loaded }
+    except Exception as e:
+        # a broken entry must not stop the batch
+        record['verdict'] = "error"
+        record['error'] = type( e ).__name__ + ": " + str( e )
+    record.setdefault( 'time', {} )['total'] = time.time() - start
+    return record
+
+def checkBatch( entries, processes=None ):
+    """check the networks of the batch entries in a pool of `processes`
+    worker processes (all CPU cores if None, no pool if 1) and generate the
+    result records in the order they complete (see `checkNetwork`)"""
+    if processes == 1:
+        for entry in entries:
+            yield checkNetwork( entry )
+        return
+    pool = multiprocessing.Pool( processes or None )
+    try:
+        for record in pool.imap_unordered( checkNetwork, entries ):
+            yield record
+    finally:
+        pool.close()
+        pool.join()
+
+def writeSia( sia, out ):
+    """write the SIA `sia` to the file `out` in the binary format (see
+    `SiaFile`)"""
+    g = sia.g
+    tables = {}
+    arrays = []
+    edges = array.array( 'i' )
+    for e in g.get_edgelist():
+        edges.extend( e )
+    arrays.append( ( 'edges', edges ) )
+    for attr in EDGE_ATTRS:
+        tables[attr], idx = _intern( g.es[attr] if g.ecount() > 0 else [] )
+        arrays.append( ( attr, idx ) )
+    arrays.append( ( 'end', array.array( 'b', g.vs['end'] ) ) )
+    arrays.append( ( 'blocking', array.array( 'b', g.vs['blocking'] ) ) )
+    if 'action' in g.vs.attributes():
+        tables['action'], idx = _intern( g.vs['action'] )
+        arrays.append( ( 'action', idx ) )
+    arrays.append( ( 'states', sia.states.data ) )
+    positions = {}
+    offset = 0
+    for name, data in arrays:
+        positions[name] = [ offset, data.typecode, len( data ) ]
+        offset += _align( len( data )*data.itemsize )
+    header = json.dumps( { 'name': sia.name, 'pname': sia.pname,
+        'v_cnt': g.vcount(), 'e_cnt': g.ecount(), 'v_init': sia.get_v_init(),
+        'systems': sia.states.systems, 'tables': tables,
+        'arrays': positions } )
+    with open( out, 'wb' ) as f:
+        f.write( SIA_MAGIC )
+        f.write( struct.pack( '<I', len( header ) ) )
+        f.write( header )
+        pos = len( SIA_MAGIC ) + 4 + len( header )
+        f.write( '\0'*( _align( pos ) - pos ) )
+        for name, data in arrays:
+            if not _NATIVE_LE:
+                data = array.array( data.typecode, data )
+                data.byteswap()
+            raw = data.tostring()
+            f.write( raw )
+            f.write( '\0'*( _align( len( raw ) ) - len( raw ) ) )
+
+def loadSia( path ):
+    """load a folded SIA from a file in the binary format"""
+    return SiaFile( path ).to_sia()
+
+def orderSequential( pnsc, nw, sia, systems ):
+    """fold order strategy: fold the systems in the given order"""
+    return systems[0]
+
+def orderShared( pnsc, nw, sia, systems ):
+    """fold order strategy: fold the system sharing the most actions with the
+    folded system next, start with the system with the most channels"""
+    if sia is None:
+        return max( systems, key=lambda s: nw.vs.find( sia=s.name ).degree() )
+    return max( systems, key=lambda s: ( len( pnsc._get_shared( nw, sia.name,
+        s.name ) ), -s.g.vcount() ) )
+
+def orderSize( pnsc, nw, sia, systems ):
+    """fold order strategy: fold the system yielding the smallest product next,
+    systems sharing actions with the folded system are preferred, start with
+    the smallest system"""
+    if sia is None:
+        return min( systems, key=lambda s: s.g.vcount() )
+    return min( systems, key=lambda s: ( len( pnsc._get_shared( nw, sia.name,
+        s.name ) ) == 0, sia.g.vcount()*s.g.vcount() ) )
+
+# fold order strategies selectable by name, a strategy is called with the PNSC,
+# the abstracted dependency graph, the folded system (None before the first
+# fold) and the list of remaining systems and returns the system to fold next
+FOLD_ORDERS = {
+    'sequential': orderSequential,
+    'shared': orderShared,
+    'size': orderSize
+}
 
 def createBuffer( name, cnt, a_in, a_out ):
     g = igraph.Graph(2, [(0,1),(1,0)], True)
@@ -548,10 +2726,38 @@ def createBuffer( name, cnt, a_in, a_out ):
         g.add_edge( i + 1, i, mode="!", name=a_out )
     return g
 
+def getTraces( g, vids, root=0 ):
+    """get a shortest trace from the vertex `root` to each vertex in `vids` as
+    a dict mapping the vertex to the list of edge ids, all traces are taken
+    from the tree of one breadth first search and unreachable vertices are
+    left out"""
+    visited, layers, parents = g.bfs( root )
+    reached = set( visited[:layers[-1]] )
+    # the edge from the parent, shared by all traces passing the vertex
+    edges = {}
+    traces = {}
+    for v in vids:
+        if v not in reached:
+            continue
+        trace = []
+        u = v
+        while u != root:
+            e = edges.get( u )
+            if e is None:
+                e = g.get_eid( parents[u], u )
+                edges[u] = e
+            trace.append( e )
+            u = parents[u]
+        trace.reverse()
+        traces[v] = trace
+    return traces
+
+def formatTrace( g, trace ):
+    """get a trace as a string of the actions and their modes"""
+    es = g.es
+    return ", ".join( [ es[e]['name'] + es[e]['mode'] for e in trace ] )
+
 def reportPath( g, v ):
-    sp = g.get_shortest_paths( 0, v, output="epath" )
-    for path in sp:
-        out = ""
-        for e in g.es( path ):
-            out += e['name'] + e['mode'] + ", "
-        print " Shortest path to state " + str( v.index ) + ": " + str( out[:-2] )
+    trace = getTraces( g, [v.index] ).get( v.index, [] )
+    print " Shortest path to state " + str( v.index ) + ": " \
+            + formatTrace( g, trace )
@@ -0,0 +1,839 @@
+#!/usr/bin/env python
+import StringIO, igraph, json, os, pickle, shutil, sia, sys, tempfile, unittest
+
+class TestSiaFold( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.verbose = False
+
+    def _edge_set( self, s ):
+        """get the edges of a folded SIA identified by the subsystem states"""
+        g = s.g
+        states = [ tuple( sorted( s.get_subsys( v ).items() ) )
+                for v in range( g.vcount() ) ]
+        edges = []
+        for e in g.es:
+            edges.append( ( states[e.source], e['name'], e['mode'],
+                tuple( sorted( s.states.get_systems( e['sys'] ) ) ),
+                states[e.target] ) )
+        return sorted( edges )
+
+    def _crossroad( self ):
+        nw = igraph.Graph( 4, [(0,1),(1,2),(2,3),(3,0)], True )
+        nw.es['sia'] = ["w", "n", "e", "s"]
+        nw.vs['sia'] = ["NW", "NE", "SE", "SW"]
+        gs = []
+        for name, acts in [ ( "NW", ["wi","w","s","so"] ),
+                ( "NE", ["ni","n","w","wo"] ), ( "SE", ["ei","e","n","no"] ),
+                ( "SW", ["si","s","e","eo"] ) ]:
+            g = igraph.Graph(3, [(0,1),(1,0),(0,2),(2,0)], True)
+            g['name'] = name
+            g.es['mode'] = ["?","!","?","!"]
+            g.es['name'] = acts
+            gs.append( g )
+        return nw, gs
+
+    def _fold_all( self, gs, shared, method ):
+        sia1 = sia.Sia( gs[0] )
+        for g in gs[1:]:
+            sia1 = sia.SiaFold( sia1, sia.Sia( g ), shared, method )
+        return sia1
+
+    def test01( self ):
+        """Reach fold creates the same graph as the product fold"""
+        nw, gs = self._crossroad()
+        shared = nw.es['sia']
+        s_prod = self._fold_all( gs, shared, "product" )
+        s_reach = self._fold_all( gs, shared, "reach" )
+        self.assertEqual( s_prod.g.vcount(), s_reach.g.vcount() )
+        self.assertEqual( s_prod.g.ecount(), s_reach.g.ecount() )
+        self.assertListEqual( self._edge_set( s_prod ),
+                self._edge_set( s_reach ) )
+        self.assertEqual( 0, s_reach.get_v_init() )
+
+    def test02( self ):
+        """Reach fold of a partially reachable product"""
+        g1 = igraph.Graph( 3, [(0,1),(2,0)], True )
+        g1['name'] = "A"
+        g1.es['mode'] = ["!","!"]
+        g1.es['name'] = ["a","b"]
+        g2 = igraph.Graph( 3, [(0,1),(2,1)], True )
+        g2['name'] = "B"
+        g2.es['mode'] = ["?",";"]
+        g2.es['name'] = ["a","d"]
+        s_prod = sia.SiaFold( sia.Sia( g1 ), sia.Sia( g2 ), ["a"] )
+        s_reach = sia.SiaFold( sia.Sia( g1 ), sia.Sia( g2 ), ["a"], "reach" )
+        if sia.numpy is not None:
+            s_vec = sia.SiaFold( sia.Sia( g1 ), sia.Sia( g2 ), ["a"], "vector" )
+            self.assertListEqual( self._edge_set( s_prod ),
+                    self._edge_set( s_vec ) )
+        self.assertEqual( 2, s_reach.g.vcount() )
+        self.assertListEqual( self._edge_set( s_prod ),
+                self._edge_set( s_reach ) )
+        self.assertListEqual( [False, True], s_reach.g.vs['end'] )
+
+    def test03( self ):
+        """Pnsc with reach fold [blocking: dl NW,NE,SE,SW]"""
+        nw, gs = self._crossroad()
+        pnsc = sia.Pnsc( nw, gs, method="reach" )
+        pnsc.fold()
+        if self.verbose: pnsc.print_error()
+        self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                set( pnsc.get_blocker() ) )
+        dls = pnsc.get_deadlocker()
+        self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ), set( dls[0] ) )
+
+    def _rename_action( self, s, name, new_name ):
+        """rename all edges of an action of the SIA `s`"""
+        s.g.es.select( s.get_edge_index().get( name, [] ) )['name'] = new_name
+        s._reset_index()
+
+    def test04( self ):
+        """Edge indices of a SIA follow renaming"""
+        g = igraph.Graph( 3, [(0,1),(0,2),(1,0),(2,0)], True )
+        g['name'] = "A"
+        g.es['mode'] = ["!","!",";","!"]
+        g.es['name'] = ["a","b","d","a"]
+        s = sia.Sia( g )
+        self.assertDictEqual( { 'a': [0, 3], 'b': [1], 'd': [2] },
+                s.get_edge_index() )
+        self.assertListEqual( [ { 'a': [0], 'b': [1] }, { 'd': [2] },
+                { 'a': [3] } ], s.get_out_index() )
+        self._rename_action( s, "a", "q" )
+        self.assertListEqual( [0, 3], s.get_edge_index()['q'] )
+        self.assertListEqual( ["q","b","d","q"], s.g.es['name'] )
+        self.assertListEqual( ["a","b","d","a"], g.es['name'] )
+
+    def test05( self ):
+        """State table of a folded SIA"""
+        t1 = sia.StateTable( ["A"], [0, 1, 2] )
+        t2 = sia.StateTable( ["B", "C"], [0, 0, 1, 2] )
+        t = t1.product( t2, [(0, 0), (2, 1), (1, 1)] )
+        self.assertEqual( 3, len( t ) )
+        self.assertTupleEqual( (2, 1, 2), t.get_row( 1 ) )
+        self.assertDictEqual( { 'A': 1, 'B': 1, 'C': 2 }, t.get_dict( 2 ) )
+        self.assertEqual( 1, t.get( 2, "A" ) )
+        self.assertListEqual( [0, 2, 2], list( t.get_column( "C" ) ) )
+        self.assertEqual( 4, t.get_mask( "C" ) )
+        self.assertListEqual( ["A", "C"], t.get_systems( 5 ) )
+        t = t.select( [2, 0] )
+        self.assertListEqual( [1, 1, 2, 0, 0, 0], list( t.data ) )
+
+    @unittest.skipIf( sia.numpy is None, "numpy is not installed" )
+    def test06( self ):
+        """Vector fold creates the same graph as the product fold"""
+        nw, gs = self._crossroad()
+        shared = nw.es['sia']
+        s_prod = self._fold_all( gs, shared, "product" )
+        s_vec = self._fold_all( gs, shared, "vector" )
+        self.assertListEqual( s_prod.g.get_edgelist(), s_vec.g.get_edgelist() )
+        self.assertListEqual( self._edge_set( s_prod ),
+                self._edge_set( s_vec ) )
+        self.assertListEqual( list( s_prod.states.data ),
+                list( s_vec.states.data ) )
+
+    def test07( self ):
+        """Fold orders of a Pnsc [blocking: dl NW,NE,SE,SW]"""
+        folded = []
+        def order( pnsc, nw, s, systems ):
+            folded.append( systems[-1].name )
+            return systems[-1]
+        for strategy in ["sequential", "shared", "size", order]:
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs, order=strategy )
+            pnsc.fold()
+            self.assertEqual( 80, pnsc.sia.g.vcount() )
+            self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                    set( pnsc.get_blocker() ) )
+            dls = pnsc.get_deadlocker()
+            self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                    set( dls[0] ) )
+        self.assertListEqual( ["SW", "SE", "NE", "NW"], folded )
+
+    def test08( self ):
+        """Parallel tree fold of a Pnsc [blocking: dl NW,NE,SE,SW]"""
+        for processes in [1, 2]:
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs, processes=processes )
+            pnsc.fold()
+            self.assertEqual( 80, pnsc.sia.g.vcount() )
+            self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                    set( pnsc.sia.states.systems ) )
+            self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                    set( pnsc.get_blocker() ) )
+            dls = pnsc.get_deadlocker()
+            self.assertSetEqual( set( ['NW', 'NE', 'SE', 'SW'] ),
+                    set( dls[0] ) )
+            self.assertListEqual( [], pnsc.get_lonelyblocker() )
+
+    def _pipeline( self ):
+        nw = igraph.Graph( 3, [(0,1),(1,2)], True )
+        nw.es['sia'] = ["a", "b"]
+        nw.vs['sia'] = ["A", "B", "C"]
+        g1 = igraph.Graph( 3, [(0,1),(0,2),(1,0),(2,0)], True )
+        g1['name'] = "A"
+        g1.es['mode'] = [";",";","!","!"]
+        g1.es['name'] = ["x","y","a","a"]
+        g2 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g2['name'] = "B"
+        g2.es['mode'] = ["?","!"]
+        g2.es['name'] = ["a","b"]
+        g3 = igraph.Graph( 2, [(0,1)], True )
+        g3['name'] = "C"
+        g3.es['mode'] = ["?"]
+        g3.es['name'] = ["b"]
+        return nw, [g1, g2, g3]
+
+    def test09( self ):
+        """Strong bisimulation reduction of a fold"""
+        nw, gs = self._pipeline()
+        s = sia.SiaFold( sia.Sia( gs[0] ), sia.Sia( gs[1] ), ["a"] )
+        self.assertEqual( 6, s.g.vcount() )
+        s.minimize()
+        # A blocks in the local states 1 and 2 while B sends b, these states
+        # stay apart, the states where both synchronize on a are merged
+        self.assertEqual( 5, s.g.vcount() )
+        self.assertEqual( 5, len( s.states ) )
+        self.assertEqual( 0, s.get_v_init() )
+        self.assertDictEqual( { 'A': 0, 'B': 0 }, s.get_subsys( 0 ) )
+
+    def test10( self ):
+        """Pnsc with reduced intermediate folds [blocking: lb A,B]"""
+        for processes in [None, 1]:
+            nw, gs = self._pipeline()
+            pnsc = sia.Pnsc( nw, gs, processes=processes )
+            pnsc.fold()
+            nw, gs = self._pipeline()
+            pnsc_red = sia.Pnsc( nw, gs, processes=processes, reduce="strong" )
+            pnsc_red.fold()
+            self.assertLess( pnsc_red.sia.g.vcount(), pnsc.sia.g.vcount() )
+            self.assertSetEqual( set( ['A', 'B'] ),
+                    set( pnsc_red.get_blocker() ) )
+            self.assertListEqual( [], pnsc_red.get_deadlocker() )
+            self.assertSetEqual( set( pnsc.get_lonelyblocker() ),
+                    set( pnsc_red.get_lonelyblocker() ) )
+
+    def test11( self ):
+        """Pnsc with weakly reduced intermediate folds [live]"""
+        nw = igraph.Graph( 3, [(0,1),(1,0)], True )
+        nw.es['sia'] = ["a", "b"]
+        nw.vs['sia'] = ["A", "B", "C"]
+        g1 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g1['name'] = "A"
+        g1.es['mode'] = ["!","?"]
+        g1.es['name'] = ["a","b"]
+        g2 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g2['name'] = "B"
+        g2.es['mode'] = ["?","!"]
+        g2.es['name'] = ["a","b"]
+        g3 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g3['name'] = "C"
+        g3.es['mode'] = [";",";"]
+        g3.es['name'] = ["c","d"]
+        s = sia.SiaFold( sia.Sia( g1 ), sia.Sia( g2 ), ["a", "b"] )
+        s.hide( set() )
+        s.minimize( weak=True )
+        self.assertEqual( 1, s.g.vcount() )
+        self.assertListEqual( [(0, 0)], s.g.get_edgelist() )
+        self.assertListEqual( ["A", "B"], s.states.get_systems(
+            s.g.es[0]['sys'] ) )
+        # a silent step outside of a cycle is merged as well, the merged
+        # state keeps the row of the state without silent steps
+        s = sia.Sia( sia.createAutomaton( "A", 3, [(0,1,"x;"), (1,2,"y;"),
+            (2,0,"a!")] ) )
+        s.hide( set( ["a"] ) )
+        s.minimize( weak=True )
+        self.assertEqual( 1, s.g.vcount() )
+        self.assertDictEqual( { 'A': 2 }, s.get_subsys( 0 ) )
+        pnsc = sia.Pnsc( nw, [g1, g2, g3], reduce="weak" )
+        pnsc.fold()
+        self.assertEqual( 2, pnsc.sia.g.vcount() )
+        self.assertFalse( pnsc.is_blocking() )
+        # each prefix of a pipeline shrinks to the state where all of its
+        # stages hold an element, the last stage takes one element only
+        n = 6
+        nw = sia.createNetwork( [ { "box": "P" + str( i ), "ports":
+            [ "c" + str( i - 1 ) + "?" ]*( i > 0 )
+            + [ "c" + str( i ) + "!" ]*( i < n - 1 ) } for i in range( n ) ] )
+        gs = [ sia.createAutomaton( "P0", 1, [(0,0,"c0!")] ) ]
+        for i in range( 1, n - 1 ):
+            gs.append( sia.createAutomaton( "P" + str( i ), 2,
+                [ (0,1,"c" + str( i - 1 ) + "?"), (1,0,"c" + str( i ) + "!") ] ) )
+        gs.append( sia.createAutomaton( "P" + str( n - 1 ), 2,
+            [ (0,1,"c" + str( n - 2 ) + "?") ] ) )
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        pnsc_red = sia.Pnsc( nw, gs, reduce="weak" )
+        pnsc_red.fold()
+        self.assertListEqual( [2, 4, 8, 16], [ fold['states_reduced']
+            for fold in pnsc.stats.folds[:-1] ] )
+        self.assertListEqual( [1, 1, 1, 1], [ fold['states_reduced']
+            for fold in pnsc_red.stats.folds[:-1] ] )
+        self.assertListEqual( ["P0", "P1", "P2", "P3", "P4"],
+                sorted( pnsc_red.get_blocker() ) )
+        info = pnsc.get_blocker_info()
+        info_red = pnsc_red.get_blocker_info()
+        for name in info:
+            self.assertListEqual( sorted( info[name][1] ),
+                    sorted( info_red[name][1] ) )
+
+    def test12( self ):
+        """Propagation of actions through a deep condensation graph"""
+        n = 5000
+        g = igraph.Graph( n, [ (i, i + 1) for i in range( n - 1 ) ], True )
+        g.vs['action'] = 0
+        g.es['sys'] = 0
+        g.es[n - 2]['sys'] = 2
+        g.vs[n - 1]['action'] = 1
+        g.vs[10]['action'] = 4
+        pnsc = sia.Pnsc( igraph.Graph( 0, directed=True ), [] )
+        pnsc._propagate_info( g )
+        self.assertListEqual( [7]*11 + [3]*( n - 12 ) + [1], g.vs['action'] )
+
+    def test13( self ):
+        """Folds are loaded from the cache if the systems did not change"""
+        path = tempfile.mkdtemp()
+        try:
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs, cache=path )
+            pnsc.fold()
+            self.assertEqual( 3, pnsc.cache.misses )
+            self.assertEqual( 3, len( os.listdir( path ) ) )
+            nw, gs = self._crossroad()
+            pnsc_cached = sia.Pnsc( nw, gs, cache=path )
+            pnsc_cached.fold()
+            self.assertEqual( 3, pnsc_cached.cache.hits )
+            self.assertEqual( pnsc.sia.key, pnsc_cached.sia.key )
+            self.assertListEqual( self._edge_set( pnsc.sia ),
+                    self._edge_set( pnsc_cached.sia ) )
+            self.assertSetEqual( set( pnsc.get_blocker() ),
+                    set( pnsc_cached.get_blocker() ) )
+            # a changed system only reuses the folds not depending on it
+            nw, gs = self._crossroad()
+            gs[3].es[0]['name'] = "sx"
+            pnsc_changed = sia.Pnsc( nw, gs, cache=path )
+            pnsc_changed.fold()
+            self.assertEqual( 2, pnsc_changed.cache.hits )
+            self.assertEqual( 1, pnsc_changed.cache.misses )
+            # the cache files are SIA files and other files are misses
+            for name in os.listdir( path ):
+                sia.SiaFile( os.path.join( path, name ) )
+            with open( os.path.join( path, pnsc.sia.key + ".sia" ),
+                    'wb' ) as f:
+                f.write( "not a fold" )
+            cache = sia.FoldCache( path )
+            self.assertIsNone( cache.get( pnsc.sia.key ) )
+            self.assertEqual( 1, cache.misses )
+            # the least recently used folds are evicted
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs, cache=sia.FoldCache( path, 0 ) )
+            pnsc.fold()
+            self.assertListEqual( [], os.listdir( path ) )
+        finally:
+            shutil.rmtree( path )
+
+    def test14( self ):
+        """Incremental update only refolds the folds of the changed system"""
+        for processes in [None, 1]:
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs, processes=processes, incremental=True )
+            pnsc.fold()
+            keys = set( pnsc._folds )
+            self.assertEqual( 3, len( keys ) )
+            g = gs[3].copy()
+            g.es[0]['name'] = "sx"
+            pnsc.update( [g] )
+            self.assertEqual( 3, len( pnsc._folds ) )
+            self.assertEqual( 2 if processes is None else 1,
+                    len( keys & set( pnsc._folds ) ) )
+            nw, gs = self._crossroad()
+            gs[3] = g
+            pnsc_full = sia.Pnsc( nw, gs, processes=processes )
+            pnsc_full.fold()
+            self.assertListEqual( self._edge_set( pnsc_full.sia ),
+                    self._edge_set( pnsc.sia ) )
+            self.assertSetEqual( set( pnsc_full.get_blocker() ),
+                    set( pnsc.get_blocker() ) )
+            g = g.copy()
+            g['name'] = "X"
+            self.assertRaises( ValueError, pnsc.update, [g] )
+            # a reloaded network reuses the folds of the unchanged systems
+            keys = set( pnsc._folds )
+            nw, gs = self._crossroad()
+            gs[3] = g
+            g['name'] = "SW"
+            pnsc.update( gs, nw=nw )
+            self.assertSetEqual( keys, set( pnsc._folds ) )
+
+    def test15( self ):
+        """Fail-fast search finds a blocking state of the full analysis"""
+        nw, gs = self._crossroad()
+        pnsc = sia.Pnsc( nw, gs )
+        state, systems, trace = pnsc.find_blocker()
+        self.assertDictEqual( { 'NW': 1, 'NE': 1, 'SE': 1, 'SW': 1 }, state )
+        self.assertListEqual( ["NW", "NE", "SE", "SW"], systems )
+        self.assertEqual( 4, len( trace ) )
+        self.assertDictEqual( state, trace[-1][2] )
+        for nw, gs in [ self._crossroad(), self._pipeline() ]:
+            pnsc = sia.Pnsc( nw, gs )
+            state, systems, trace = pnsc.find_blocker()
+            pnsc.fold()
+            self.assertTrue( set( systems ) <= set( pnsc.get_blocker() ) )
+            v = [ v for v in range( pnsc.sia.g.vcount() )
+                    if pnsc.sia.get_subsys( v ) == state ]
+            self.assertTrue( pnsc.sia.g.vs[v[0]]['blocking'] )
+        nw = igraph.Graph( 2, [(0,1),(1,0)], True )
+        nw.es['sia'] = ["a", "b"]
+        nw.vs['sia'] = ["A", "B"]
+        g1 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g1['name'] = "A"
+        g1.es['mode'] = ["!","?"]
+        g1.es['name'] = ["a","b"]
+        g2 = igraph.Graph( 2, [(0,1),(1,0)], True )
+        g2['name'] = "B"
+        g2.es['mode'] = ["?","!"]
+        g2.es['name'] = ["a","b"]
+        self.assertIsNone( sia.Pnsc( nw, [g1, g2] ).find_blocker() )
+
+    def test16( self ):
+        """Shortest traces to all states from one breadth first search"""
+        nw, gs = self._crossroad()
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        g = pnsc.sia.g
+        init = pnsc.sia.get_v_init()
+        traces = pnsc.sia.get_traces( range( g.vcount() ) )
+        self.assertEqual( g.vcount(), len( traces ) )
+        es = g.get_edgelist()
+        for v, trace in traces.iteritems():
+            path = g.get_shortest_paths( init, v, output="epath" )[0]
+            self.assertEqual( len( path ), len( trace ) )
+            u = init
+            for e in trace:
+                self.assertEqual( u, es[e][0] )
+                u = es[e][1]
+            self.assertEqual( v, u )
+        blocking = g.vs.select( blocking=True ).indices
+        self.assertListEqual( sorted( blocking ),
+                sorted( pnsc.get_traces() ) )
+        # the engines without folds search the traces in the product
+        for engine in ["por", "symbolic"]:
+            pnsc = sia.Pnsc( nw, gs, engine=engine )
+            pnsc.fold()
+            traces = pnsc.get_traces()
+            for name, ( pname, info ) in pnsc.get_blocker_info().iteritems():
+                for state in info:
+                    for state_pnsc in info[state]['states']:
+                        trace = traces[pnsc._get_state_key( state_pnsc )]
+                        self.assertDictEqual( state_pnsc, trace[-1][2] )
+            # both searches find shortest traces
+            net = sia.SiaNet( nw, pnsc.systems )
+            expected = net.get_traces( traces.keys() )
+            for key, trace in traces.iteritems():
+                self.assertEqual( len( expected[key] ), len( trace ) )
+            out = sys.stdout
+            sys.stdout = StringIO.StringIO()
+            try:
+                pnsc.print_error( traces=-1 )
+                self.assertIn( "trace to", sys.stdout.getvalue() )
+            finally:
+                sys.stdout = out
+
+    def test17( self ):
+        """Symbolic engine computes the blocking information of the folds"""
+        for nw, gs in [ self._crossroad(), self._pipeline() ]:
+            pnsc = sia.Pnsc( nw, gs )
+            pnsc.fold()
+            pnsc_sym = sia.Pnsc( nw, gs, engine="symbolic" )
+            self.assertIsNone( pnsc_sym.fold() )
+            self.assertSetEqual( set( pnsc.get_blocker() ),
+                    set( pnsc_sym.get_blocker() ) )
+            self.assertListEqual( sorted( map( sorted,
+                pnsc.get_deadlocker() ) ), sorted( map( sorted,
+                    pnsc_sym.get_deadlocker() ) ) )
+            self.assertSetEqual( set( pnsc.get_lonelyblocker() ),
+                    set( pnsc_sym.get_lonelyblocker() ) )
+            net = sia.SiaSymbolic( nw, pnsc.systems )
+            self.assertEqual( pnsc.sia.g.vcount(),
+                    net.count( net.get_reach() ) )
+        # a token ring, the product has 2^n states but only n are reachable
+        n = 30
+        nw = igraph.Graph( n, [ (i, ( i + 1 ) % n) for i in range( n ) ],
+                True )
+        nw.es['sia'] = [ "t" + str( i ) for i in range( n ) ]
+        nw.vs['sia'] = [ "R" + str( i ) for i in range( n ) ]
+        gs = []
+        for i in range( n ):
+            g = igraph.Graph( 2, [(0,1),(1,0)], True )
+            g['name'] = "R" + str( i )
+            g.es['mode'] = ["!","?"] if i == 0 else ["?","!"]
+            g.es['name'] = [ "t" + str( i ), "t" + str( ( i - 1 ) % n ) ] \
+                    if i == 0 else [ "t" + str( i - 1 ), "t" + str( i ) ]
+            gs.append( g )
+        pnsc = sia.Pnsc( nw, gs, engine="symbolic" )
+        pnsc.fold()
+        self.assertFalse( pnsc.is_blocking() )
+        net = sia.SiaSymbolic( nw, pnsc.systems )
+        self.assertEqual( n, net.count( net.get_reach() ) )
+        self.assertRaises( ValueError, sia.Pnsc, nw, gs, engine="bdd" )
+
+    def _loose( self, n ):
+        """get n independent systems with internal steps and a deadlocking
+        pair of systems"""
+        nw = igraph.Graph( n + 2, [(0,1),(0,1)], True )
+        nw.es['sia'] = ["a", "b"]
+        nw.vs['sia'] = ["A", "B"] + [ "P" + str( i ) for i in range( n ) ]
+        g1 = igraph.Graph( 2, [(0,1)], True )
+        g1['name'] = "A"
+        g1.es['mode'] = ["!"]
+        g1.es['name'] = ["a"]
+        g2 = igraph.Graph( 2, [(0,1)], True )
+        g2['name'] = "B"
+        g2.es['mode'] = ["?"]
+        g2.es['name'] = ["b"]
+        gs = [g1, g2]
+        for i in range( n ):
+            g = igraph.Graph( 4, [(0,1),(1,2),(2,3)], True )
+            g['name'] = "P" + str( i )
+            g.es['mode'] = [";",";",";"]
+            g.es['name'] = [ "p" + str( i ) + "_" + str( j )
+                    for j in range( 3 ) ]
+            gs.append( g )
+        return nw, gs
+
+    def test18( self ):
+        """Partial order reduction of independent systems [blocking: dl A,B]"""
+        nw, gs = self._loose( 4 )
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        self.assertEqual( 4**4, pnsc.sia.g.vcount() )
+        pnsc_por = sia.Pnsc( nw, gs, engine="por" )
+        self.assertIsNone( pnsc_por.fold() )
+        for p in [pnsc, pnsc_por]:
+            self.assertSetEqual( set( ["A", "B"] ), set( p.get_blocker() ) )
+            self.assertListEqual( [["A", "B"]], map( sorted,
+                p.get_deadlocker() ) )
+            self.assertListEqual( [], p.get_lonelyblocker() )
+        nw, gs = self._loose( 12 )
+        pnsc = sia.Pnsc( nw, gs, engine="por" )
+        net = sia.SiaNet( nw, pnsc.systems, por=True )
+        # the full product has 4^12 states
+        blocking = net.find_all_blocking()
+        self.assertEqual( 12*3 + 1, net.state_cnt )
+        self.assertEqual( net.state_cnt, len( blocking ) )
+        self.assertTrue( all( b == [0, 1] for state, b in blocking ) )
+        state, systems, trace = pnsc.find_blocker()
+        self.assertListEqual( ["A", "B"], systems )
+        self.assertEqual( 0, state['A'] )
+
+    def test19( self ):
+        """Write and load a folded SIA in the binary format"""
+        path = tempfile.mkdtemp()
+        numpy = sia.numpy
+        try:
+            nw, gs = self._crossroad()
+            pnsc = sia.Pnsc( nw, gs )
+            pnsc.fold()
+            out = os.path.join( path, "out.sia" )
+            pnsc.sia.write( out )
+            for np in [numpy, None]:
+                sia.numpy = np
+                f = sia.SiaFile( out )
+                self.assertEqual( pnsc.sia.g.vcount(), f.v_cnt )
+                self.assertEqual( pnsc.sia.g.ecount(), f.e_cnt )
+                self.assertListEqual( pnsc.sia.g.es['mode'],
+                        f.get_attr( 'mode' ) )
+                self.assertListEqual( [ i for e in pnsc.sia.g.get_edgelist()
+                    for i in e ], list( f.get_array( 'edges' ) ) )
+                for v in range( f.v_cnt ):
+                    self.assertDictEqual( pnsc.sia.get_subsys( v ),
+                            f.get_subsys( v ) )
+                s = sia.loadSia( out )
+                self.assertListEqual( self._edge_set( pnsc.sia ),
+                        self._edge_set( s ) )
+                self.assertEqual( pnsc.sia.get_v_init(), s.get_v_init() )
+                self.assertListEqual( pnsc.sia.g.vs['end'], s.g.vs['end'] )
+                # the verdict of the analysis is kept
+                self.assertListEqual( pnsc.sia.g.vs['blocking'],
+                        s.g.vs['blocking'] )
+                self.assertListEqual( pnsc.sia.g.vs['action'],
+                        s.g.vs['action'] )
+            self.assertIn( True, pnsc.sia.g.vs['blocking'] )
+            # a fold without the blocking analysis has no action bitmasks
+            s1, s2 = sia.Sia( gs[0] ), sia.Sia( gs[1] )
+            sia.SiaFold( s1, s2, nw.es['sia'] ).write( out )
+            s = sia.loadSia( out )
+            self.assertNotIn( True, s.g.vs['blocking'] )
+            self.assertNotIn( 'action', s.g.vs.attributes() )
+            self.assertRaises( ValueError, sia.SiaFile, __file__ )
+        finally:
+            sia.numpy = numpy
+            shutil.rmtree( path )
+
+    def test20( self ):
+        """Load a JSON network and infer the channels from the ports [live]"""
+        nw, gs = sia.loadNetwork( "test/feedback1.json",
+                ["test/feedback4_2.gml", "test/feedback4_1.gml"] )
+        self.assertListEqual( ["A", "B"], nw.vs['sia'] )
+        self.assertListEqual( [(0, 1), (1, 0)], nw.get_edgelist() )
+        self.assertListEqual( ["a", "b"], nw.es['sia'] )
+        self.assertListEqual( ["A", "B"], [ g['name'] for g in gs ] )
+        self.assertListEqual( [(0, 1), (1, 0)], gs[0].get_edgelist() )
+        self.assertListEqual( ["!", "?"], gs[0].es['mode'] )
+        self.assertListEqual( [True, False], sia.Sia( gs[0] ).g.vs['end'] )
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        self.assertFalse( pnsc.is_blocking() )
+        self.assertRaises( ValueError, sia.loadNetwork,
+                "test/feedback1.json" )
+        # a pipeline of boxes with the automata in the network description
+        n = 1000
+        boxes = []
+        for i in range( n ):
+            ports = []
+            edges = []
+            if i > 0:
+                ports.append( "c" + str( i - 1 ) + "?" )
+                edges.append( ( 0, 1, "c" + str( i - 1 ) + "?" ) )
+            if i < n - 1:
+                ports.append( "c" + str( i ) + "!" )
+                edges.append( ( len( edges ), len( edges ) + 1,
+                    "c" + str( i ) + "!" ) )
+            boxes.append( { "box": "P" + str( i ), "ports": ports,
+                "automaton": { "states": len( edges ) + 1, "edges": edges,
+                    "end": [ len( edges ) ] } } )
+        nw = sia.createNetwork( boxes )
+        self.assertEqual( n - 1, nw.ecount() )
+        gs = [ sia.createAutomaton( box['box'], box['automaton']['states'],
+            box['automaton']['edges'], end=box['automaton']['end'] )
+            for box in boxes ]
+        pnsc = sia.Pnsc( nw, gs, engine="por" )
+        pnsc.fold()
+        self.assertFalse( pnsc.is_blocking() )
+        self.assertRaises( ValueError, sia.createNetwork,
+                [ { "box": "A", "ports": ["a"] } ] )
+        self.assertRaises( ValueError, sia.createNetwork,
+                [ { "box": "A", "ports": ["a!"] },
+                    { "box": "B", "ports": ["a!"] } ] )
+        # every network of the test directory, some list a port twice
+        for name in sorted( os.listdir( "test" ) ):
+            if name.endswith( ".json" ):
+                with open( os.path.join( "test", name ) ) as f:
+                    boxes = json.load( f )
+                nw = sia.createNetwork( boxes )
+                self.assertListEqual( [ box['box'] for box in boxes ],
+                        nw.vs['sia'] )
+
+    def test21( self ):
+        """Check a batch of networks listed in a manifest"""
+        path = tempfile.mkdtemp()
+        try:
+            manifest = os.path.join( path, "manifest.json" )
+            test = os.path.abspath( "test" )
+            with open( manifest, 'w' ) as f:
+                json.dump( [
+                    { "name": "feedback", "net": os.path.join( test,
+                        "feedback1.json" ), "infiles": [ os.path.join( test,
+                            gf ) for gf in ["feedback4_1.gml",
+                                "feedback4_2.gml"] ], "format": "gml" },
+                    { "name": "serial", "net": os.path.join( test,
+                        "serial5.json" ) },
+                    { "name": "queue", "net": os.path.join( test,
+                        "test_queue1.json" ), "infiles": ["missing.gml"] }
+                    ], f )
+            entries = sia.loadManifest( manifest )
+            self.assertEqual( os.path.join( path, "missing.gml" ),
+                    entries[2]['infiles'][0] )
+            for processes in [1, 2]:
+                records = dict( ( r['name'], r ) for r
+                        in sia.checkBatch( entries, processes ) )
+                self.assertListEqual( ["feedback", "queue", "serial"],
+                        sorted( records ) )
+                self.assertEqual( "live", records['feedback']['verdict'] )
+                self.assertListEqual( [], records['feedback']['blocker'] )
+                self.assertEqual( 2, records['feedback']['states'] )
+                self.assertIn( 'check', records['feedback']['time'] )
+                self.assertEqual( "error", records['serial']['verdict'] )
+                self.assertEqual( "error", records['queue']['verdict'] )
+            record = sia.checkNetwork( { "net": os.path.join( path,
+                "missing.graphml" ) } )
+            self.assertEqual( "error", record['verdict'] )
+            self.assertIn( 'total', record['time'] )
+        finally:
+            shutil.rmtree( path )
+
+    def test22( self ):
+        """The stats hold the sizes of each fold step and the phase timings"""
+        nw, gs = self._crossroad()
+        pnsc = sia.Pnsc( nw, gs, incremental=True )
+        pnsc.fold()
+        folds = pnsc.stats.folds
+        self.assertEqual( 3, len( folds ) )
+        self.assertListEqual( [9, 27, 81],
+                [ fold['states_full'] for fold in folds ] )
+        self.assertListEqual( [1, 1, 2],
+                [ fold['shared'] for fold in folds ] )
+        for fold in folds:
+            self.assertFalse( fold['cached'] )
+            self.assertLessEqual( fold['states'], fold['states_full'] )
+            self.assertLessEqual( fold['edges'], fold['edges_full'] )
+        self.assertEqual( pnsc.sia.g.vcount(), folds[-1]['states'] )
+        self.assertEqual( pnsc.sia.g.ecount(), folds[-1]['edges'] )
+        self.assertListEqual( ["fold", "collapse", "propagate", "expand",
+            "blocking", "separate"],
+            [ phase['name'] for phase in pnsc.stats.phases ] )
+        json.dumps( pnsc.stats.get_dict() )
+        # the stats are reset and the folds of the previous run are cached
+        pnsc.update( [] )
+        self.assertTrue( all( fold['cached'] for fold
+            in pnsc.stats.folds ) )
+        self.assertEqual( 6, len( pnsc.stats.phases ) )
+        pnsc = sia.Pnsc( nw, gs, engine="por" )
+        pnsc.fold()
+        self.assertListEqual( [], pnsc.stats.folds )
+        self.assertListEqual( ["por"],
+                [ phase['name'] for phase in pnsc.stats.phases ] )
+
+    def test23( self ):
+        """The fold steps are estimated and checked against the budget"""
+        nw, gs = self._crossroad()
+        shared = nw.es['sia']
+        s1, s2 = sia.Sia( gs[0] ), sia.Sia( gs[1] )
+        s_fold = sia.SiaFold( s1, s2, shared )
+        self.assertEqual( s_fold.size_full + ( s_fold.g.vcount(), ),
+                sia.estimateFold( s1, s2, shared ) )
+        self.assertEqual( s_fold.size_full + ( 9, ),
+                sia.estimateFold( s1, s2, shared, samples=0 ) )
+        # the reachable part is extrapolated from the sample
+        states, edges, reach = sia.estimateFold( s1, s2, shared, samples=4 )
+        self.assertEqual( 9, states )
+        self.assertLessEqual( reach, states )
+        # the last fold step of 81 states is switched to the reach fold
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        nw, gs = self._crossroad()
+        pnsc_budget = sia.Pnsc( nw, gs, max_states=80 )
+        pnsc_budget.fold()
+        self.assertListEqual( ["product", "product", "reach"],
+                [ fold['method'] for fold in pnsc_budget.stats.folds ] )
+        self.assertListEqual( self._edge_set( pnsc.sia ),
+                self._edge_set( pnsc_budget.sia ) )
+        self.assertSetEqual( set( pnsc.get_blocker() ),
+                set( pnsc_budget.get_blocker() ) )
+        # the step which would overflow is reported before the fold
+        nw, gs = self._crossroad()
+        with self.assertRaises( sia.BudgetExceeded ) as cm:
+            sia.Pnsc( nw, gs, max_states=20 ).fold()
+        self.assertEqual( ( "NWNE", "SE" ), cm.exception.step )
+        self.assertEqual( 20, cm.exception.limit )
+        nw, gs = self._crossroad()
+        with self.assertRaises( sia.BudgetExceeded ):
+            sia.Pnsc( nw, gs, max_memory=10000 ).fold()
+        # the reach fold stops at the limit and the error can be pickled
+        with self.assertRaises( sia.BudgetExceeded ) as cm:
+            sia.SiaFold( s1, s2, shared, "reach", max_states=5 )
+        e = pickle.loads( pickle.dumps( cm.exception ) )
+        self.assertEqual( ( "NW", "NE" ), e.step )
+        self.assertEqual( str( cm.exception ), str( e ) )
+        with self.assertRaises( sia.BudgetExceeded ):
+            sia.SiaFold( s1, s2, shared, max_states=5 )
+
+    def _buffer_fold( self, g, buf_len ):
+        """fold a box with one buffer automaton per output port, the fold
+        ends in the end states of the box with empty buffers"""
+        box = sia.Sia( g )
+        end = box.g.vs['end']
+        ports = sorted( set( box.g.es( mode='!' )['name'] ) )
+        for port in ports:
+            self._rename_action( box, port, "_queue_" + port )
+        for port in ports:
+            g_buf = igraph.Graph( buf_len + 1, [ ( i, i + 1 ) for i
+                in range( buf_len ) ] + [ ( i + 1, i ) for i
+                    in range( buf_len ) ], True )
+            g_buf['name'] = port
+            g_buf.es['name'] = ["_queue_" + port]*buf_len + [port]*buf_len
+            g_buf.es['mode'] = ["?"]*buf_len + ["!"]*buf_len
+            box = sia.SiaFold( box, sia.Sia( g_buf ), ["_queue_" + port] )
+        box.g.vs['end'] = [ end[row[0]] and not any( row[1:] ) or is_end
+                for row, is_end in zip( map( box.states.get_row,
+                    range( box.g.vcount() ) ), box.g.vs['end'] ) ]
+        return box
+
+    def test24( self ):
+        """Buffered boxes are built directly with the behaviour of a fold"""
+        g = igraph.Graph( 3, [(0,1),(1,2),(2,0),(1,0),(2,2)], True )
+        g['name'] = "A"
+        g.es['name'] = ["c", "a", "b", "x", "a"]
+        g.es['mode'] = ["?", "!", "!", ";", "!"]
+        labels = {}
+        def colors( s ):
+            return [ labels.setdefault( ( e['name'], e['pname'], e['mode'] ),
+                len( labels ) ) for e in s.g.es ]
+        nw = igraph.Graph( 1 )
+        nw.vs['sia'] = ["A"]
+        for buf_len in range( 4 ):
+            pnsc = sia.PnscBuffer( nw, [g], buf_len=buf_len )
+            s_buf = pnsc.systems[0]
+            s_ref = self._buffer_fold( g, buf_len )
+            self.assertEqual( s_ref.g.vcount(), s_buf.g.vcount() )
+            self.assertEqual( s_ref.g.ecount(), s_buf.g.ecount() )
+            self.assertTrue( s_buf.g.isomorphic_vf2( s_ref.g,
+                color1=s_buf.g.vs['init'], color2=s_ref.g.vs['init'],
+                edge_color1=colors( s_buf ), edge_color2=colors( s_ref ) ) )
+            self.assertListEqual( sorted( s_ref.g.vs['end'] ),
+                    sorted( s_buf.g.vs['end'] ) )
+            self.assertEqual( "A", s_buf.name )
+            self.assertListEqual( ["A"], s_buf.states.systems )
+        self.assertEqual( 3*4*4, s_buf.g.vcount() )
+        # the graph of the box is not changed
+        self.assertListEqual( ["c", "a", "b", "x", "a"], g.es['name'] )
+        # a box without outputs is not changed
+        g.es['mode'] = ["?", "?", "?", ";", "?"]
+        s_buf = sia.PnscBuffer( nw, [g], buf_len=2 ).systems[0]
+        self.assertEqual( 3, s_buf.g.vcount() )
+        self.assertListEqual( sorted( g.es['name'] ),
+                sorted( s_buf.g.es['name'] ) )
+        # the end states of a buffered box are kept
+        nw = sia.createNetwork( [ { "box": "C", "ports": ["a!", "b?"] },
+            { "box": "S", "ports": ["a?", "b!"] } ] )
+        gs = [ sia.createAutomaton( "C", 3, [ (0,1,"a!"), (1,2,"b?") ] ),
+            sia.createAutomaton( "S", 2, [ (0,1,"a?"), (1,0,"b!") ],
+                end=[0] ) ]
+        pnsc = sia.Pnsc( nw, gs )
+        pnsc.fold()
+        self.assertFalse( pnsc.is_blocking() )
+        for buf_len in range( 1, 3 ):
+            s_buf = sia.PnscBuffer( nw, gs, buf_len=buf_len ).systems[1]
+            s_ref = self._buffer_fold( gs[1], buf_len )
+            self.assertListEqual( sorted( s_ref.g.vs['end'] ),
+                    sorted( s_buf.g.vs['end'] ) )
+            pnsc = sia.PnscBuffer( nw, gs, buf_len=buf_len )
+            pnsc.fold()
+            self.assertFalse( pnsc.is_blocking() )
+
+    def test26( self ):
+        """Reduced folds keep the blocking local states of all states
+        [blocking: lb A,B]"""
+        nw = sia.createNetwork( [ { "box": "A", "ports": ["a!"] },
+            { "box": "B", "ports": ["a?", "b!"] },
+            { "box": "C", "ports": ["b?"] } ] )
+        gs = [ sia.createAutomaton( "A", 4, [ (0,1,"x;"), (0,2,"y;"),
+                (1,3,"a!"), (2,3,"a!") ] ),
+            sia.createAutomaton( "B", 3, [ (0,1,"b!"), (1,2,"a?") ] ),
+            sia.createAutomaton( "C", 2, [ (0,1,"w;") ] ) ]
+        for reduce in [None, "strong", "weak"]:
+            pnsc = sia.Pnsc( nw, gs, reduce=reduce )
+            pnsc.fold()
+            info = pnsc.get_blocker_info()
+            self.assertListEqual( [1, 2], sorted( info['A'][1] ) )
+            self.assertListEqual( [0], sorted( info['B'][1] ) )
+            # the weak reduction merges the silent choice of A into B
+            if reduce is not None:
+                self.assertEqual( { "strong": 6, "weak": 4 }[reduce],
+                        pnsc.stats.folds[0]['states_reduced'] )
+            traces = pnsc.get_traces( info['A'][1][2]['states'] )
+            self.assertEqual( len( info['A'][1][2]['states'] ),
+                    len( traces ) )
+
+if __name__ == '__main__':
+    unittest.main()